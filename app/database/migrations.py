@@ -0,0 +1,119 @@
+"""Schema upgrades for databases created before the current models
+
+Base.metadata.create_all only creates missing tables; it never alters existing ones or
+adds indexes to them. The upgrades below bring older tables in line with the models.
+Each one is paired with a catalog check and only runs while the check still finds the
+old shape, so an up-to-date database takes no DDL locks. They run on every startup with
+CREATE_TABLES_ON_STARTUP, and deployments that manage the schema separately run them
+once per release:
+
+    python -m app.database.migrations
+"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.database.models import QUIZ_ACCURACY_SQL
+
+logger = logging.getLogger(__name__)
+
+
+def _column_matches(table: str, column: str, condition: str = "TRUE") -> str:
+    """Query returning a row when the column exists in the current schema and matches condition"""
+    return (
+        "SELECT 1 FROM information_schema.columns "
+        f"WHERE table_schema = current_schema() AND table_name = '{table}' "
+        f"AND column_name = '{column}' AND {condition}"
+    )
+
+
+def _column_missing(table: str, column: str) -> str:
+    """Query returning a row when the table exists in the current schema without the column"""
+    return (
+        "SELECT 1 FROM information_schema.tables "
+        f"WHERE table_schema = current_schema() AND table_name = '{table}' "
+        f"AND NOT EXISTS ({_column_matches(table, column)})"
+    )
+
+
+def _index_missing(table: str, index: str) -> str:
+    """Query returning a row when the table exists in the current schema without a valid index"""
+    return (
+        "SELECT 1 FROM information_schema.tables "
+        f"WHERE table_schema = current_schema() AND table_name = '{table}' "
+        "AND NOT EXISTS ("
+        "SELECT 1 FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        f"WHERE n.nspname = current_schema() AND c.relname = '{index}' AND i.indisvalid)"
+    )
+
+
+# (check, statement) pairs; the statement runs only when its check returns a row
+SCHEMA_UPGRADES = [
+    # quizzes.accuracy became a stored generated column
+    (
+        _column_missing("quizzes", "accuracy"),
+        "ALTER TABLE quizzes ADD COLUMN accuracy double precision "
+        f"GENERATED ALWAYS AS ({QUIZ_ACCURACY_SQL}) STORED"
+    ),
+    # profiles.last_quiz_date went from VARCHAR(10) 'YYYY-MM-DD' to DATE; malformed legacy
+    # values become NULL (no streak) instead of aborting the upgrade
+    (
+        _column_matches("profiles", "last_quiz_date", "data_type <> 'date'"),
+        "ALTER TABLE profiles ALTER COLUMN last_quiz_date TYPE date USING "
+        r"CASE WHEN last_quiz_date ~ '^\d{4}-\d{2}-\d{2}$' THEN last_quiz_date::date END"
+    ),
+    # certification_documents.claimed_at lets a crashed run's "processing" claim expire
+    (
+        _column_missing("certification_documents", "claimed_at"),
+        "ALTER TABLE certification_documents ADD COLUMN claimed_at timestamp without time zone"
+    ),
+    # questions.options/correct_answer/user_answer went from JSON to JSONB together; one ALTER
+    # converts all three in a single table rewrite
+    (
+        _column_matches("questions", "options", "data_type = 'json'"),
+        "ALTER TABLE questions "
+        "ALTER COLUMN options TYPE jsonb USING options::jsonb, "
+        "ALTER COLUMN correct_answer TYPE jsonb USING correct_answer::jsonb, "
+        "ALTER COLUMN user_answer TYPE jsonb USING user_answer::jsonb"
+    ),
+]
+
+# (table, index, columns) for indexes declared in the models after their tables already existed.
+# They are built CONCURRENTLY so writes continue during the build; a build that failed half-way
+# leaves an invalid index behind, which is dropped and rebuilt on the next run.
+INDEX_UPGRADES = [
+    ("quizzes", "ix_quiz_user_cert", "user_id, certification_id"),
+    ("questions", "ix_question_quiz", "quiz_id"),
+    ("certification_documents", "ix_certdoc_cert_status", "certification_id, processing_status"),
+    ("achievements", "ix_achievement_user_earned", "user_id, earned_at DESC"),
+    ("quizzes", "ix_quiz_user_created", "user_id, created_at DESC"),
+]
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Apply the schema upgrades and indexes an existing database still needs"""
+    applied = 0
+    with engine.begin() as conn:
+        for check, statement in SCHEMA_UPGRADES:
+            if conn.execute(text(check)).first() is not None:
+                conn.execute(text(statement))
+                applied += 1
+    
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table, index, columns in INDEX_UPGRADES:
+            if conn.execute(text(_index_missing(table, index))).first() is not None:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} ({columns})"))
+                applied += 1
+    logger.info("Schema upgrades applied: %s", applied)
+
+
+if __name__ == "__main__":
+    from app.database.db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema(engine)
@@ -1,22 +1,23 @@
 """SQLAlchemy database models"""
 
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Boolean, JSON, Numeric, CheckConstraint, UniqueConstraint, Enum as SQLEnum
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Computed, Float, String, Integer, Text, Date, DateTime, ForeignKey, Boolean, Numeric, UniqueConstraint, Index, Enum as SQLEnum, text
+from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from datetime import datetime
-import uuid
 from app.database.enums import Difficulty, QuestionType
+from app.utils.ids import uuid7
 
 
-Base = declarative_base()
+class Base(DeclarativeBase):
+    """Declarative base for all ORM models"""
+    pass
 
 
 class Certification(Base):
     """AWS Certification model"""
     __tablename__ = "certifications"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     name = Column(String(255), unique=True, nullable=False)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -35,7 +36,7 @@ class User(Base):
     """User model (extends auth table)"""
     __tablename__ = "users"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     email = Column(String(255), unique=True, nullable=False)
     username = Column(String(255), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
@@ -58,13 +59,13 @@ class Profile(Base):
     """User profile model"""
     __tablename__ = "profiles"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     selected_certification_id = Column(UUID(as_uuid=True), ForeignKey("certifications.id"), nullable=True)
     xp = Column(Integer, default=0)
     level = Column(Integer, default=1)
     current_streak = Column(Integer, default=0)
-    last_quiz_date = Column(String(10), nullable=True)  # YYYY-MM-DD
+    last_quiz_date = Column(Date, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -76,23 +77,35 @@ class Profile(Base):
         return f"<Profile {self.user_id}>"
 
 
+# Generation expression of quizzes.accuracy (shared with the schema upgrade in app.database.migrations)
+QUIZ_ACCURACY_SQL = (
+    "CASE WHEN total_questions > 0 "
+    "THEN COALESCE(score, 0)::float / total_questions * 100 ELSE 0 END"
+)
+
+
 class Quiz(Base):
     """Quiz model"""
     __tablename__ = "quizzes"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     certification_id = Column(UUID(as_uuid=True), ForeignKey("certifications.id"), nullable=False)
     difficulty = Column(SQLEnum(Difficulty, name='difficulty_enum'), nullable=False, default=Difficulty.EASY.value)
     score = Column(Integer, default=0)
     total_questions = Column(Integer, default=0)
     xp_earned = Column(Integer, default=0)
+    # Percentage of correct answers, maintained by Postgres whenever score/total_questions change
+    accuracy = Column(Float, Computed(QUIZ_ACCURACY_SQL, persisted=True))
     generation_time_seconds = Column(Numeric(10, 2), nullable=True)  # Time to generate quiz in seconds
     llm_model = Column(String(255), nullable=True)  # Model name used (e.g., 'gpt-4o-mini')
     completed_at = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-
+    __table_args__ = (
+        Index("ix_quiz_user_cert", "user_id", "certification_id"),
+        Index("ix_quiz_user_created", "user_id", text("created_at DESC")),
+    )
     
     # Relationships
     user = relationship("User", back_populates="quizzes")
@@ -107,13 +120,13 @@ class Question(Base):
     """Question model"""
     __tablename__ = "questions"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False)
     question_text = Column(Text, nullable=False)
     question_type = Column(SQLEnum(QuestionType, name='question_type_enum'), nullable=False)
-    options = Column(JSON, nullable=False)  # List of options
-    correct_answer = Column(JSON, nullable=False)  # String or List
-    user_answer = Column(JSON, nullable=True)  # User's response
+    options = Column(JSONB, nullable=False)  # List of options
+    correct_answer = Column(JSONB, nullable=False)  # String or List
+    user_answer = Column(JSONB, nullable=True)  # User's response
     explanation = Column(Text, nullable=True)
     is_correct = Column(Boolean, nullable=True)
     difficulty = Column(SQLEnum(Difficulty, name='difficulty_enum'), nullable=False)
@@ -121,7 +134,9 @@ class Question(Base):
     xp_earned = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-
+    __table_args__ = (
+        Index("ix_question_quiz", "quiz_id"),
+    )
     
     # Relationships
     quiz = relationship("Quiz", back_populates="questions")
@@ -134,15 +149,20 @@ class CertificationDocument(Base):
     """Documents associated with a certification (exam guides, PDFs, training)."""
     __tablename__ = "certification_documents"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     certification_id = Column(UUID(as_uuid=True), ForeignKey("certifications.id", ondelete="CASCADE"), nullable=False)
     filename = Column(String(255), nullable=False)
     s3_key = Column(String(1024), nullable=True)
     uri = Column(String(1024), nullable=True)  # S3 URI: s3://bucket/key
     processing_status = Column(String(20), default="pending")  # pending, processing, completed, failed
+    claimed_at = Column(DateTime, nullable=True)  # When a processing run last set status to "processing"
     processed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_certdoc_cert_status", "certification_id", "processing_status"),
+    )
+
     # Relationships
     certification = relationship("Certification", back_populates="documents")
 
@@ -154,7 +174,7 @@ class UserProgress(Base):
     """User progress per certification"""
     __tablename__ = "user_progress"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     certification_id = Column(UUID(as_uuid=True), ForeignKey("certifications.id"), nullable=False)
     total_xp = Column(Integer, default=0)
@@ -163,8 +183,8 @@ class UserProgress(Base):
     correct_answers = Column(Integer, default=0)
     accuracy = Column(Numeric(5, 2), default=0)
     current_difficulty = Column(SQLEnum(Difficulty, name='difficulty_enum'), default=Difficulty.EASY.value)
-    domain_difficulties = Column(JSON, default={})  # Per-domain difficulty levels
-    weak_domains = Column(JSON, default=[])  # List of weak domains
+    domain_difficulties = Column(JSONB, default=dict)  # Per-domain difficulty levels
+    weak_domains = Column(JSONB, default=list)  # List of weak domains
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
@@ -183,13 +203,17 @@ class Achievement(Base):
     """Achievement/Badge model"""
     __tablename__ = "achievements"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     achievement_type = Column(String(50), nullable=False)  # streak, accuracy, milestone
     achievement_name = Column(String(255), nullable=False)
     achievement_description = Column(Text, nullable=True)
     earned_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index("ix_achievement_user_earned", "user_id", text("earned_at DESC")),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="achievements")
     
@@ -1,23 +1,29 @@
 """Main FastAPI application"""
 
+import asyncio
 import logging
+import re
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import update
 
-from app.config import settings
-from app.database.db import engine, get_db
+from app.config import get_settings
+from app.database.db import engine, SessionLocal
 from app.database.models import Base
+from app.database.migrations import upgrade_schema
 from app.routers import auth, certification, quiz, progress, profile
-from app.utils.create_initial_admin import create_initial_admin
-from app.utils.seed_certifications import seed_certifications
-from app.services.document_processor import document_processor
+from app.services.certification_service import claimable_documents
+from app.services.document_processor import document_processor, shutdown_pdf_extraction_pool
 from app.services.embedding_service import embedding_service
+from app.services.quiz_generator import get_quiz_chain
+from app.services.quiz_pool import invalidate_quiz_pool
 from app.services.vector_store import vector_store
+from app.utils.create_initial_admin import create_initial_admin
+from app.utils.seed_certifications import seed_certifications
 from app.database.models import CertificationDocument
 from datetime import datetime
-import threading
 
 # Configure logging
 logging.basicConfig(
@@ -25,61 +31,155 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+# Read once for the hot health/root endpoints
+APP_ENV = settings.ENV
+APP_VERSION = settings.APP_VERSION
 
-def process_seed_documents_background(documents_to_process):
-    """Process seed documents in background thread"""
-    logger.info(f"Starting background processing of {len(documents_to_process)} seed documents")
+
+# Chunks per embedding request when processing seed documents
+SEED_EMBEDDING_BATCH_SIZE = 32
+# Embedding/upsert batches in flight at once (bounds peak memory for vectors)
+SEED_MAX_CONCURRENT_BATCHES = 16
+
+
+async def process_seed_documents_background(documents_to_process):
+    """Process seed documents in a background task, batching embeddings across documents"""
+    logger.info("Starting background processing of %s seed documents", len(documents_to_process))
     
-    db = next(get_db())
+    docs = []
     try:
-        for doc_id, cert_id in documents_to_process:
-            try:
-                doc = db.query(CertificationDocument).filter(
-                    CertificationDocument.id == doc_id
-                ).first()
-                
-                if not doc or doc.processing_status == "completed":
-                    continue
-                
-                # Update status
-                doc.processing_status = "processing"
-                db.commit()
-                
-                logger.info(f"Processing seed document {doc.filename}")
-                
-                # Process document
-                chunks = document_processor.process_document(
-                    url=doc.uri,
+        # Short-lived sessions only around DB work, so no pooled connection is
+        # held while waiting on downloads, OpenAI or Qdrant
+        with SessionLocal() as db:
+            cert_by_doc = dict(documents_to_process)
+            # Claim them the same way process_documents_sync does, so a run still in
+            # progress elsewhere keeps its documents
+            rows = db.execute(
+                update(CertificationDocument)
+                .where(CertificationDocument.id.in_(list(cert_by_doc)), claimable_documents())
+                .values(processing_status="processing", claimed_at=datetime.utcnow())
+                .returning(CertificationDocument.id, CertificationDocument.uri)
+            ).all()
+            db.commit()
+            docs = [(doc_id, uri, cert_by_doc[str(doc_id)]) for doc_id, uri in rows]
+        
+        if not docs:
+            return
+        
+        # Extract and chunk all documents concurrently
+        results = await asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    document_processor.process_document,
+                    url=uri,
                     certification_id=cert_id,
-                    document_id=doc_id
+                    document_id=str(doc_id)
                 )
-                
-                # Generate embeddings
-                chunk_texts = [chunk.text for chunk in chunks]
-                embeddings = embedding_service.embed_texts(chunk_texts)
-                
-                # Store in vector database
-                chunk_data = [
-                    {"text": chunk.text, "metadata": chunk.metadata}
-                    for chunk in chunks
-                ]
-                vector_store.upsert_chunks(cert_id, chunk_data, embeddings)
-                
-                # Update status
-                doc.processing_status = "completed"
-                doc.processed_at = datetime.utcnow()
-                db.commit()
-                
-                logger.info(f"Successfully processed seed document {doc.filename}")
-                
-            except Exception as e:
-                logger.error(f"Failed to process seed document {doc_id}: {e}")
-                if doc:
-                    doc.processing_status = "failed"
+                for doc_id, uri, cert_id in docs
+            ],
+            return_exceptions=True
+        )
+        
+        failed_ids = []
+        processed = []  # (doc_id, cert_id, chunks)
+        for (doc_id, _, cert_id), result in zip(docs, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to process seed document %s: %s", doc_id, result)
+                failed_ids.append(doc_id)
+            else:
+                processed.append((doc_id, cert_id, result))
+        
+        # Skip chunks already stored by an earlier run (point IDs are content-addressed)
+        processed = [
+            (doc_id, cert_id, await vector_store.filter_new_chunks_async(cert_id, chunks))
+            for doc_id, cert_id, chunks in processed
+        ]
+        
+        # Embed and store chunks batch by batch so only a few batches of vectors are in memory at once
+        all_chunks = [
+            (doc_id, cert_id, chunk)
+            for doc_id, cert_id, chunks in processed
+            for chunk in chunks
+        ]
+        # Create collections up front so concurrent batches don't race to create them
+        for cert_id in {cert_id for _, cert_id, _ in processed}:
+            await vector_store.create_collection_async(cert_id)
+        
+        semaphore = asyncio.Semaphore(SEED_MAX_CONCURRENT_BATCHES)
+        
+        async def embed_and_store(batch):
+            async with semaphore:
+                embeddings = await embedding_service.embed_texts_async(
+                    [chunk.text for _, _, chunk in batch]
+                )
+                by_certification = {}
+                for (_, cert_id, chunk), embedding in zip(batch, embeddings):
+                    entry = by_certification.setdefault(cert_id, ([], []))
+                    entry[0].append(chunk)
+                    entry[1].append(embedding)
+                for cert_id, (cert_chunks, cert_embeddings) in by_certification.items():
+                    await vector_store.upsert_chunks_async(cert_id, cert_chunks, cert_embeddings)
+        
+        batches = [
+            all_chunks[i:i + SEED_EMBEDDING_BATCH_SIZE]
+            for i in range(0, len(all_chunks), SEED_EMBEDDING_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *[embed_and_store(batch) for batch in batches],
+            return_exceptions=True
+        )
+        
+        # A document is completed only if every batch holding its chunks succeeded
+        failed_in_batches = set()
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to embed/store seed document batch: %s", result)
+                failed_in_batches.update(doc_id for doc_id, _, _ in batch)
+        failed_ids.extend(failed_in_batches)
+        completed_ids = [
+            doc_id for doc_id, _, _ in processed if doc_id not in failed_in_batches
+        ]
+        
+        # Record final statuses in bulk
+        with SessionLocal() as db:
+            if completed_ids:
+                db.execute(
+                    update(CertificationDocument)
+                    .where(CertificationDocument.id.in_(completed_ids))
+                    .values(processing_status="completed", processed_at=datetime.utcnow())
+                )
+            if failed_ids:
+                db.execute(
+                    update(CertificationDocument)
+                    .where(CertificationDocument.id.in_(failed_ids))
+                    .values(processing_status="failed")
+                )
+            db.commit()
+        for cert_id in {cert_id for doc_id, cert_id, _ in processed if doc_id not in failed_in_batches}:
+            invalidate_quiz_pool(cert_id)
+        
+        logger.info(
+            "Processed seed documents: %s completed, %s failed", len(completed_ids), len(failed_ids)
+        )
+    except Exception as e:
+        # Release whatever this run still holds, so the next run can claim it right away
+        if docs:
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        update(CertificationDocument)
+                        .where(
+                            CertificationDocument.id.in_([doc_id for doc_id, _, _ in docs]),
+                            CertificationDocument.processing_status == "processing"
+                        )
+                        .values(processing_status="failed")
+                    )
                     db.commit()
-    finally:
-        db.close()
+            except Exception as release_error:
+                logger.error("Failed to mark seed documents failed: %s", release_error)
+        logger.error("Seed document processing failed: %s", e)
 
 
 # Lifespan context manager
@@ -88,35 +188,48 @@ async def lifespan(app: FastAPI):
     """Application startup and shutdown"""
     # Startup
     logger.info("Starting AWS Mind Quest API...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created")
+    if settings.CREATE_TABLES_ON_STARTUP:
+        Base.metadata.create_all(bind=engine)
+        upgrade_schema(engine)
+        logger.info("Database tables created")
+    
+    # Build the shared quiz chains (prompt, ChatOpenAI client, parser) once, before the first request
+    for with_context in (False, True):
+        get_quiz_chain(with_context=with_context)
     
     # Create initial admin user if none exists
     try:
-        db = next(get_db())
-        create_initial_admin(db)
-        # Seed predefined certifications and get documents to process
-        try:
-            documents_to_process = seed_certifications(db)
-            
-            # Process seed documents in background thread
-            if documents_to_process:
-                thread = threading.Thread(
-                    target=process_seed_documents_background,
-                    args=(documents_to_process,),
-                    daemon=True
-                )
-                thread.start()
-                logger.info(f"Started background thread to process {len(documents_to_process)} seed documents")
-        except Exception as e:
-            logger.error(f"Error seeding certifications: {e}")
+        with SessionLocal() as db:
+            create_initial_admin(db)
+            # Seed predefined certifications and get documents to process
+            try:
+                documents_to_process = seed_certifications(db)
+                
+                # Process seed documents in a background task on the running loop
+                if documents_to_process:
+                    app.state.seed_documents_task = asyncio.create_task(
+                        process_seed_documents_background(documents_to_process)
+                    )
+                    logger.info("Started background task to process %s seed documents", len(documents_to_process))
+            except Exception as e:
+                logger.error("Error seeding certifications: %s", e)
     except Exception as e:
-        logger.error(f"Error creating initial admin: {e}")
+        logger.error("Error creating initial admin: %s", e)
     
     yield
     
     # Shutdown
     logger.info("Shutting down AWS Mind Quest API...")
+    seed_task = getattr(app.state, "seed_documents_task", None)
+    if seed_task is not None and not seed_task.done():
+        seed_task.cancel()
+        try:
+            await seed_task
+        except asyncio.CancelledError:
+            pass
+    await embedding_service.async_client.close()
+    await vector_store.aclose()
+    shutdown_pdf_extraction_pool()
 
 
 # Create FastAPI app
@@ -125,15 +238,18 @@ app = FastAPI(
     description=settings.APP_DESCRIPTION,
     version=settings.APP_VERSION,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     openapi_url="/api/openapi.json"
 )
 
 
-# Add CORS middleware
+# Add CORS middleware (configured origins matched by a single precompiled regex)
+cors_origin_regex = "^(?:" + "|".join(re.escape(origin) for origin in settings.CORS_ORIGINS) + ")$"
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
+    allow_origins=["*"] if "*" in settings.CORS_ORIGINS else [],
+    allow_origin_regex=cors_origin_regex,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -146,8 +262,8 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "environment": settings.ENV,
-        "version": settings.APP_VERSION
+        "environment": APP_ENV,
+        "version": APP_VERSION
     }
 
 
@@ -157,7 +273,7 @@ async def root():
     """Root endpoint"""
     return {
         "message": "AWS Mind Quest API",
-        "version": settings.APP_VERSION,
+        "version": APP_VERSION,
         "docs": "/api/docs"
     }
 
@@ -173,7 +289,7 @@ app.include_router(profile.router)
 # Global exception handlers
 @app.exception_handler(ValueError)
 async def value_error_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={"detail": str(exc)}
     )
@@ -181,8 +297,8 @@ async def value_error_handler(request, exc):
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error"}
     )
@@ -1,8 +1,11 @@
 """Authentication routes"""
 
+import hashlib
 import logging
-from datetime import timedelta
+import time
+from cachetools import TLRUCache
 from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database.db import get_db
 from app.schemas.user import UserRegister, UserLogin, TokenResponse, UserResponse
@@ -12,6 +15,19 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
+# How long an authenticated user is served from cache before the token is re-verified
+USER_CACHE_TTL_SECONDS = 30
+
+
+def _user_cache_ttu(_key, value, now):
+    """Expire cached users after the TTL, or earlier if the token itself expires"""
+    _, token_exp = value
+    return min(now + USER_CACHE_TTL_SECONDS, token_exp)
+
+
+# SHA-256(token) -> (UserResponse, token expiry); raw tokens are never stored
+_user_cache = TLRUCache(maxsize=5000, ttu=_user_cache_ttu, timer=time.time)
+
 
 def get_token(authorization: str = Header(None)):
     """Extract token from Authorization header"""
@@ -39,7 +55,7 @@ def get_token(authorization: str = Header(None)):
             raise ValueError("Invalid scheme")
         return token
     except Exception as e:
-        logger.error(f"Token extraction error: {e}")
+        logger.error("Token extraction error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authorization header format"
@@ -52,6 +68,11 @@ async def get_current_user_dep(
     db: Session = Depends(get_db)
 ) -> UserResponse:
     """Dependency to get current user from token"""
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _user_cache.get(cache_key)
+    if cached:
+        return cached[0]
+    
     token_data = AuthService.verify_token(token)
     if not token_data:
         raise HTTPException(
@@ -60,14 +81,28 @@ async def get_current_user_dep(
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    user = AuthService.get_user_by_id(db, token_data.sub)
-    if not user:
+    user_response = AuthService.get_user_response_by_id(db, token_data.sub)
+    if not user_response:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse.model_validate(user)
+    if token_data.exp:
+        _user_cache[cache_key] = (user_response, token_data.exp)
+    return user_response
+
+
+async def require_admin(
+    current_user: UserResponse = Depends(get_current_user_dep)
+) -> UserResponse:
+    """Dependency for admin-only routes"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required"
+        )
+    return current_user
 
 
 @router.post("/register", response_model=TokenResponse, status_code=201)
@@ -83,25 +118,9 @@ async def register(
     - **password**: User password (will be hashed)
     """
     
-    # Check if user already exists
-    existing_user = AuthService.get_user_by_email(db, user_data.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Email already registered"
-        )
-    
-    existing_username = db.query(AuthService.get_user_by_email.__globals__["User"]).filter(
-        AuthService.get_user_by_email.__globals__["User"].username == user_data.username
-    ).first()
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Username already taken"
-        )
-    
-    # Create user
-    hashed_password = AuthService.hash_password(user_data.password)
+    # Create user (INSERT ... ON CONFLICT DO NOTHING; no separate existence check)
+    # argon2id is deliberately slow and memory-hard; keep it off the event loop
+    hashed_password = await run_in_threadpool(AuthService.hash_password, user_data.password)
     try:
         user = AuthService.create_user(
             db=db,
@@ -111,13 +130,21 @@ async def register(
             selected_certification_id=user_data.selected_certification_id
         )
     except Exception as e:
-        logger.error(f"Error creating user: {e}")
+        logger.error("Error creating user: %s", e)
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to create user"
         )
     
+    if user is None:
+        # Conflict path only: find out which unique field clashed
+        existing_user = AuthService.get_user_by_email_or_username(db, user_data.email, user_data.username)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email already registered" if existing_user is None or existing_user.email == user_data.email else "Username already taken"
+        )
+    
     # Create access token
     access_token = AuthService.create_access_token(
         data={"sub": str(user.id), "email": user.email}
@@ -149,8 +176,11 @@ async def login(
             detail="Invalid email or password"
         )
     
-    # Verify password
-    if not AuthService.verify_password(credentials.password, user.hashed_password):
+    # Verify password (hashing runs in the threadpool so it doesn't block the event loop)
+    verified, new_hash = await run_in_threadpool(
+        AuthService.verify_and_update_password, credentials.password, user.hashed_password
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -163,6 +193,12 @@ async def login(
             detail="User account is inactive"
         )
     
+    # Transparently upgrade legacy (bcrypt) hashes to the current argon2id settings
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        AuthService.invalidate_cached_user(user.id)
+    
     # Create access token
     access_token = AuthService.create_access_token(
         data={"sub": str(user.id), "email": user.email}
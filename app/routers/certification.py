@@ -1,38 +1,62 @@
 import logging
-from typing import List
+from typing import List, Optional
 from uuid import UUID
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app.database.db import get_db
-from app.schemas.certification import CertificationResponse
+from app.schemas.certification import CertificationResponse, CertificationDocumentResponse
 from app.schemas.user import UserResponse
-from app.routers.auth import get_current_user_dep
-from app.services.certification_service import CertificationService
+from app.routers.auth import require_admin
+from app.services.certification_service import CertificationService, process_documents_task
+from app.utils.s3 import is_staged_upload
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/certifications", tags=["certifications"])
 
+# Serialized certification list; the table is near-static and only changes via admin routes
+_CERTIFICATIONS_CACHE_KEY = "all"
+_certifications_cache = TTLCache(maxsize=1, ttl=30)
+
 
 def get_certification_service(db: Session = Depends(get_db)) -> CertificationService:
     """Provide a CertificationService instance per request via DI."""
     return CertificationService(db)
 
 
+def _document_response(doc, processing_status: Optional[str] = None) -> CertificationDocumentResponse:
+    """Document response; the uri stays null while the upload is only staged on local disk"""
+    return CertificationDocumentResponse(
+        id=doc.id,
+        filename=doc.filename,
+        uri=None if is_staged_upload(doc.uri) else doc.uri,
+        processing_status=processing_status or doc.processing_status,
+        processed_at=doc.processed_at,
+        created_at=doc.created_at
+    )
+
+
 @router.get("", response_model=List[CertificationResponse])
 async def list_certifications(
-    db: Session = Depends(get_db),
     service: CertificationService = Depends(get_certification_service)
 ):
     """Get all available AWS certifications"""
-    return service.list_all()
+    payload = _certifications_cache.get(_CERTIFICATIONS_CACHE_KEY)
+    if payload is None:
+        payload = [
+            CertificationResponse.model_validate(c).model_dump(mode="json")
+            for c in service.list_all()
+        ]
+        _certifications_cache[_CERTIFICATIONS_CACHE_KEY] = payload
+    return ORJSONResponse(payload)
 
 
 @router.get("/{certification_id}", response_model=CertificationResponse)
 async def get_certification(
     certification_id: UUID,
-    db: Session = Depends(get_db),
     service: CertificationService = Depends(get_certification_service)
 ):
     """Get specific certification by ID"""
@@ -53,9 +77,8 @@ async def create_certification(
     name: str = Form(...),
     description: str | None = Form(None),
     documents: list[UploadFile] | None = File(None),
-    db: Session = Depends(get_db),
     service: CertificationService = Depends(get_certification_service),
-    current_user: UserResponse = Depends(get_current_user_dep),
+    current_user: UserResponse = Depends(require_admin),
 ):
     """Create a new certification (admin only)"""
     # Convert UploadFile to list if needed
@@ -64,31 +87,33 @@ async def create_certification(
     certification = service.create(
         name=name,
         description=description,
-        user_id=current_user.id,
         documents=doc_list
     )
+    _certifications_cache.clear()
     
-    # Queue background processing for uploaded documents
+    # Queue one background task that processes all uploaded documents together
     if doc_list:
-        for doc in service.get_documents(certification.id):
-            if doc.processing_status == "pending":
-                background_tasks.add_task(
-                    service.process_document_sync,
-                    str(doc.id),
-                    str(certification.id)
-                )
+        pending_ids = [
+            str(doc.id) for doc in service.get_documents(certification.id)
+            if doc.processing_status == "pending"
+        ]
+        if pending_ids:
+            background_tasks.add_task(
+                process_documents_task,
+                pending_ids,
+                str(certification.id)
+            )
     
     return certification
 
 
-@router.post("/{certification_id}/documents", status_code=201)
+@router.post("/{certification_id}/documents", response_model=CertificationDocumentResponse, status_code=201)
 async def upload_certification_document(
     background_tasks: BackgroundTasks,
     certification_id: UUID,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
     service: CertificationService = Depends(get_certification_service),
-    current_user: UserResponse = Depends(get_current_user_dep),
+    current_user: UserResponse = Depends(require_admin),
 ):
     """Upload a document for a certification (admin only)"""
     # Verify certification exists
@@ -98,52 +123,36 @@ async def upload_certification_document(
             detail="Certification not found"
         )
     
-    # Upload document
+    # Stage document (uploaded to S3 by the background task)
     doc = service.add_document(certification_id, file)
     
     # Queue background processing
     background_tasks.add_task(
-        service.process_document_sync,
-        str(doc.id),
+        process_documents_task,
+        [str(doc.id)],
         str(certification_id)
     )
     
-    return {
-        "id": str(doc.id),
-        "filename": doc.filename,
-        "uri": doc.uri,
-        "processing_status": "queued"
-    }
+    return _document_response(doc, processing_status="queued")
 
 
 @router.delete("/documents/{document_id}")
 async def delete_document(
     document_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user_dep),
+    current_user: UserResponse = Depends(require_admin),
     service: CertificationService = Depends(get_certification_service)
 ):
     """Delete a certification document (admin only)"""
-    service.delete_document(document_id, current_user.id)
+    service.delete_document(document_id)
     return {"detail": "Document deleted"}
 
 
-@router.get("/{certification_id}/documents")
+@router.get("/{certification_id}/documents", response_model=List[CertificationDocumentResponse])
 async def get_certification_documents(
     certification_id: UUID,
-    db: Session = Depends(get_db),
     service: CertificationService = Depends(get_certification_service)
 ):
     """Get all documents for a certification"""
     documents = service.get_documents(certification_id)
     
-    return [
-        {
-            "id": str(doc.id),
-            "filename": doc.filename,
-            "processing_status": doc.processing_status,
-            "processed_at": doc.processed_at,
-            "created_at": doc.created_at
-        }
-        for doc in documents
-    ]
\ No newline at end of file
+    return [_document_response(doc) for doc in documents]
\ No newline at end of file
@@ -1,7 +1,6 @@
 """User profile routes"""
 
 import logging
-from uuid import UUID
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
@@ -20,8 +19,7 @@ def get_profile_service(db: Session = Depends(get_db)) -> ProfileService:
     return ProfileService(db)
 
 @router.get("", response_model=ProfileResponse)
-async def get_profile(
-    db: Session = Depends(get_db),
+def get_profile(
     service: ProfileService = Depends(get_profile_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
@@ -31,9 +29,8 @@ async def get_profile(
 
 
 @router.patch("", response_model=ProfileResponse)
-async def update_profile(
+def update_profile(
     update_data: ProfileUpdate,
-    db: Session = Depends(get_db),
     service: ProfileService = Depends(get_profile_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
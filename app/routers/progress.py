@@ -1,54 +1,64 @@
 """Progress and user stats routes"""
 
 import logging
+from typing import Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.database.db import get_db
 from app.schemas.progress import ProgressResponse, AchievementResponse, DashboardStats
 from app.routers.auth import get_current_user_dep
 from app.schemas.user import UserResponse
-from app.services.progress_service import ProgressService
+from app.services.progress_service import ProgressService, cache_progress, get_cached_progress
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/progress", tags=["progress"])
 
+# Validate and dump whole ORM result lists in one pydantic-core call each
+_progress_list_adapter = TypeAdapter(list[ProgressResponse])
+_achievement_list_adapter = TypeAdapter(list[AchievementResponse])
+
+
+def _dump_list(adapter: TypeAdapter, rows) -> list:
+    """Serialize ORM rows to JSON-ready dicts through a list adapter"""
+    return adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+
 
 def get_progress_service(db: Session = Depends(get_db)) -> ProgressService:
     """Provide ProgressService via DI per request."""
     return ProgressService(db)
 
 @router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(
-    db: Session = Depends(get_db),
+def get_dashboard_stats(
+    include_progresses: bool = True,
     service: ProgressService = Depends(get_progress_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
-    """Get user dashboard statistics"""
-    stats = service.get_dashboard_stats(current_user.id)
+    """
+    Get user dashboard statistics
     
-    return DashboardStats(
-        total_xp=stats["total_xp"],
-        level=stats["level"],
-        current_streak=stats["current_streak"],
-        total_quizzes=stats["total_quizzes"],
-        total_questions=stats["total_questions"],
-        average_accuracy=stats["average_accuracy"],
-        recent_achievements=[
-            AchievementResponse.model_validate(a) for a in stats["recent_achievements"]
-        ],
-        progresses=[
-            ProgressResponse.model_validate(p) for p in stats["progresses"]
-        ]
-    )
+    - **include_progresses**: Set to false to skip the per-certification progress list
+    """
+    cache_key = ("dashboard", include_progresses)
+    payload = get_cached_progress(current_user.id, cache_key)
+    if payload is not None:
+        return ORJSONResponse(payload)
+    
+    stats = service.get_dashboard_stats(current_user.id, include_progresses=include_progresses)
+    
+    # Nested ORM rows are read via from_attributes in the same validation pass
+    payload = DashboardStats.model_validate(stats, from_attributes=True).model_dump(mode="json")
+    cache_progress(current_user.id, cache_key, payload)
+    return ORJSONResponse(payload)
 
 
 @router.get("/certifications/{certification_id}", response_model=ProgressResponse)
-async def get_certification_progress(
+def get_certification_progress(
     certification_id: UUID,
-    db: Session = Depends(get_db),
     service: ProgressService = Depends(get_progress_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
@@ -58,23 +68,38 @@ async def get_certification_progress(
 
 
 @router.get("/certifications", response_model=list[ProgressResponse])
-async def get_all_progress(
-    db: Session = Depends(get_db),
+def get_all_progress(
     service: ProgressService = Depends(get_progress_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
     """Get user progress for all certifications"""
-    progresses = service.get_all_progress(current_user.id)
-    return [ProgressResponse.model_validate(p) for p in progresses]
+    payload = get_cached_progress(current_user.id, "progresses")
+    if payload is None:
+        payload = _dump_list(_progress_list_adapter, service.get_all_progress(current_user.id))
+        cache_progress(current_user.id, "progresses", payload)
+    return ORJSONResponse(payload)
 
 
 @router.get("/achievements", response_model=list[AchievementResponse])
-async def get_achievements(
-    db: Session = Depends(get_db),
+def get_achievements(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     service: ProgressService = Depends(get_progress_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
-    """Get all user achievements"""
-    achievements = service.get_achievements(current_user.id)
-    return [AchievementResponse.model_validate(a) for a in achievements]
+    """
+    Get user achievements, newest first
+    
+    - **limit**: Optional page size; omit to get every achievement
+    - **offset**: Pagination offset
+    """
+    cache_key = ("achievements", limit, offset)
+    payload = get_cached_progress(current_user.id, cache_key)
+    if payload is None:
+        payload = _dump_list(
+            _achievement_list_adapter,
+            service.get_achievements(current_user.id, limit=limit, offset=offset)
+        )
+        cache_progress(current_user.id, cache_key, payload)
+    return ORJSONResponse(payload)
 
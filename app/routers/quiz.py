@@ -1,17 +1,18 @@
 import logging
+from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.database.db import get_db
 from app.schemas.quiz import (
-    QuizGenerateRequest, QuizGenerateResponse, QuizEvaluateRequest,
-    QuizEvaluateResponse, QuizHistoryResponse, QuizDetailResponse
+    QuizGenerateRequest, QuizGenerateResponse, QuizBulkGenerateRequest, QuizBulkGenerateResult, QuizPoolPrefillRequest, QuizEvaluateRequest,
+    QuizEvaluateResponse, QuizHistoryResponse, QuizDetailResponse, QuestionResponse
 )
 from app.services.quiz_service import QuizService
-from app.services.quiz_generator import QuizGeneratorService
+from app.services.quiz_generator import AWS_DOMAINS, QuizGeneratorService, generate_many, prefill_quiz_pools_task
 from app.services.quiz_evaluator import QuizEvaluatorService
-from app.routers.auth import get_current_user_dep
+from app.routers.auth import get_current_user_dep, require_admin
 from app.schemas.user import UserResponse
 from app.utils.timer import timer
 
@@ -39,7 +40,6 @@ def get_quiz_evaluator_service(db: Session = Depends(get_db)) -> QuizEvaluatorSe
 @timer(logger=logger)
 async def generate_quiz(
     request: QuizGenerateRequest,
-    db: Session = Depends(get_db),
     generator: QuizGeneratorService = Depends(get_quiz_generator_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
@@ -66,54 +66,104 @@ async def generate_quiz(
             weak_domains=request.weak_domains
         )
         
-        # Build response with questions
-        questions = [
-            {
-                "id": q.id,
-                "quiz_id": q.quiz_id,
-                "question_text": q.question_text,
-                "question_type": q.question_type,
-                "options": q.options,
-                "correct_answer": q.correct_answer,
-                "explanation": q.explanation,
-                "difficulty": q.difficulty,
-                "domain": q.domain,
-                "user_answer": q.user_answer,
-                "is_correct": q.is_correct,
-                "xp_earned": q.xp_earned,
-                "created_at": q.created_at
-            }
-            for q in quiz.questions
-        ]
-        
-        return QuizGenerateResponse(
-            quiz_id=quiz.id,
-            certification_id=quiz.certification_id,
-            difficulty=quiz.difficulty,
-            total_questions=quiz.total_questions,
-            questions=questions
-        )
+        return _build_generate_response(quiz)
         
     except ValueError as e:
-        logger.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Error generating quiz: {e}")
+        logger.error("Error generating quiz: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate quiz"
         )
 
 
+@router.post("/generate/bulk", response_model=List[QuizBulkGenerateResult], status_code=201)
+@timer(logger=logger)
+async def generate_quizzes_bulk(
+    request: QuizBulkGenerateRequest,
+    current_user: UserResponse = Depends(get_current_user_dep)
+):
+    """
+    Generate several quizzes concurrently (e.g. pre-fetching the next difficulty level)
+    
+    Takes up to 10 generate requests and returns one result per request, in the same order.
+    Each result carries either the quiz or the error for that request, so one failed
+    generation does not discard the others.
+    Generations run in parallel, so the whole call takes about as long as the slowest one.
+    """
+    
+    try:
+        results = await generate_many(current_user.id, request.quizzes)
+    except Exception as e:
+        logger.error("Error generating quizzes: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate quizzes"
+        )
+    
+    return [
+        QuizBulkGenerateResult(index=index, error=_generation_error(result))
+        if isinstance(result, Exception)
+        else QuizBulkGenerateResult(index=index, quiz=_build_generate_response(result))
+        for index, result in enumerate(results)
+    ]
+
+
+def _generation_error(error: Exception) -> str:
+    """Client-facing message for a failed generation, matching the single-quiz endpoint"""
+    return str(error) if isinstance(error, ValueError) else "Failed to generate quiz"
+
+
+def _build_generate_response(quiz) -> QuizGenerateResponse:
+    """Build the generate response for a freshly created quiz"""
+    questions = [QuestionResponse.model_validate(q) for q in quiz.questions]
+    
+    return QuizGenerateResponse(
+        quiz_id=quiz.id,
+        certification_id=quiz.certification_id,
+        difficulty=quiz.difficulty,
+        total_questions=quiz.total_questions,
+        questions=questions
+    )
+
+
+@router.post("/pools/prefill", status_code=202)
+async def prefill_quiz_pools(
+    request: QuizPoolPrefillRequest,
+    background_tasks: BackgroundTasks,
+    current_user: UserResponse = Depends(require_admin)
+):
+    """
+    Pre-generate quizzes for a certification through the OpenAI Batch API (admin only)
+    
+    Tops up the generation pool of every (difficulty, domains) combination so later
+    quiz requests are served without an interactive LLM call. The batch job completes
+    within 24 hours and costs half as much as interactive generation.
+    
+    The pools live in this worker's memory and the job is polled from this worker, so
+    pre-filling only helps single-worker deployments, and a restart before the batch
+    completes discards it.
+    """
+    domain_sets = request.domain_sets or [AWS_DOMAINS[:3]]
+    background_tasks.add_task(
+        prefill_quiz_pools_task,
+        request.certification_id,
+        [difficulty.value for difficulty in request.difficulties],
+        domain_sets
+    )
+    return {"status": "queued"}
+
+
 @router.post("/{quiz_id}/evaluate", response_model=QuizEvaluateResponse)
 @timer(logger=logger)
 async def evaluate_quiz(
     quiz_id: UUID,
     request: QuizEvaluateRequest,
-    db: Session = Depends(get_db),
     evaluator: QuizEvaluatorService = Depends(get_quiz_evaluator_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
@@ -164,13 +214,13 @@ async def evaluate_quiz(
         )
         
     except ValueError as e:
-        logger.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Error evaluating quiz: {e}")
+        logger.error("Error evaluating quiz: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to evaluate quiz"
@@ -179,11 +229,10 @@ async def evaluate_quiz(
 
 @router.get("", response_model=list[QuizHistoryResponse])
 @timer(logger=logger)
-async def get_quiz_history(
+def get_quiz_history(
     certification_id: UUID = None,
     limit: int = 20,
     offset: int = 0,
-    db: Session = Depends(get_db),
     service: QuizService = Depends(get_quiz_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
@@ -204,7 +253,7 @@ async def get_quiz_history(
             difficulty=q.difficulty,
             score=q.score,
             total_questions=q.total_questions,
-            accuracy=(q.score / q.total_questions * 100) if q.total_questions > 0 else 0,
+            accuracy=q.accuracy,
             xp_earned=q.xp_earned,
             completed_at=q.completed_at
         )
@@ -214,42 +263,22 @@ async def get_quiz_history(
 
 @router.get("/{quiz_id}", response_model=QuizDetailResponse)
 @timer(logger=logger)
-async def get_quiz_detail(
+def get_quiz_detail(
     quiz_id: UUID,
-    db: Session = Depends(get_db),
     service: QuizService = Depends(get_quiz_service),
     current_user: UserResponse = Depends(get_current_user_dep)
 ):
     """Get detailed quiz information with all questions"""
     quiz = service.get_quiz_by_id(quiz_id, current_user.id)
     
-    accuracy = (quiz.score / quiz.total_questions * 100) if quiz.total_questions > 0 else 0
-    
     return QuizDetailResponse(
         id=quiz.id,
         certification_id=quiz.certification_id,
         difficulty=quiz.difficulty,
         score=quiz.score,
         total_questions=quiz.total_questions,
-        accuracy=accuracy,
+        accuracy=quiz.accuracy,
         xp_earned=quiz.xp_earned,
-        questions=[
-            {
-                "id": q.id,
-                "quiz_id": q.quiz_id,
-                "question_text": q.question_text,
-                "question_type": q.question_type,
-                "options": q.options,
-                "correct_answer": q.correct_answer,
-                "explanation": q.explanation,
-                "difficulty": q.difficulty,
-                "domain": q.domain,
-                "user_answer": q.user_answer,
-                "is_correct": q.is_correct,
-                "xp_earned": q.xp_earned,
-                "created_at": q.created_at
-            }
-            for q in quiz.questions
-        ],
+        questions=[QuestionResponse.model_validate(q) for q in quiz.questions],
         completed_at=quiz.completed_at
     )
@@ -1,8 +1,9 @@
 """Certification schemas"""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
+from typing import Optional
 
 
 class CertificationCreate(BaseModel):
@@ -28,3 +29,16 @@ class CertificationResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class CertificationDocumentResponse(BaseModel):
+    """Certification document (upload response and document listing)"""
+    id: UUID
+    filename: str
+    uri: Optional[str] = Field(
+        None,
+        description="S3 URL of the document; null until background processing has published the upload"
+    )
+    processing_status: str
+    processed_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
@@ -3,7 +3,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import UUID
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict
 
 
 class WeakDomainInfo(BaseModel):
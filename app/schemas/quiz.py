@@ -3,7 +3,9 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Optional, List, Any, Union
+from typing import Optional, List, Union
+
+from app.database.enums import Difficulty
 
 
 class QuestionBase(BaseModel):
@@ -51,6 +53,27 @@ class QuizGenerateRequest(BaseModel):
         }
 
 
+class QuizBulkGenerateRequest(BaseModel):
+    """Generate several quizzes at once (e.g. pre-fetching the next difficulty)"""
+    quizzes: List[QuizGenerateRequest] = Field(..., min_length=1, max_length=10)
+
+
+class QuizPoolPrefillRequest(BaseModel):
+    """Pre-generate quizzes for a certification (admin)"""
+    certification_id: UUID
+    difficulties: List[Difficulty] = list(Difficulty)
+    domain_sets: Optional[List[List[str]]] = None  # defaults to the standard focus domains
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "certification_id": "550e8400-e29b-41d4-a716-446655440000",
+                "difficulties": ["easy", "medium"],
+                "domain_sets": [["EC2", "VPC"], ["IAM", "S3"]]
+            }
+        }
+
+
 class QuizGenerateResponse(BaseModel):
     """Generate quiz response"""
     quiz_id: UUID
@@ -87,6 +110,13 @@ class QuizGenerateResponse(BaseModel):
         }
 
 
+class QuizBulkGenerateResult(BaseModel):
+    """Outcome of one request in a bulk generation: either the quiz or the error"""
+    index: int  # position of the request in QuizBulkGenerateRequest.quizzes
+    quiz: Optional[QuizGenerateResponse] = None
+    error: Optional[str] = None
+
+
 class QuizEvaluateRequest(BaseModel):
     """Evaluate quiz request"""
     quiz_id: UUID
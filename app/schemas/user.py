@@ -1,7 +1,7 @@
 """User request/response schemas"""
 
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 from uuid import UUID
 
@@ -60,8 +60,9 @@ class TokenResponse(BaseModel):
 
 class TokenData(BaseModel):
     """JWT token payload data"""
-    sub: str  # user_id
+    sub: UUID  # user_id
     email: str
+    exp: Optional[int] = None  # expiry (epoch seconds)
 
 
 class ProfileResponse(BaseModel):
@@ -73,7 +74,7 @@ class ProfileResponse(BaseModel):
     xp: int
     level: int
     current_streak: int
-    last_quiz_date: Optional[str]
+    last_quiz_date: Optional[date]
     created_at: datetime
     
     class Config:
@@ -1,20 +1,41 @@
 """Authentication service"""
 
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
-from jose import JWTError, jwt
+from cachetools import TTLCache
+import jwt
+from jwt import PyJWTError
 from passlib.context import CryptContext
+from pydantic import ValidationError
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.database.models import User
-from app.schemas.user import TokenData
+from app.schemas.user import TokenData, UserResponse
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: new hashes use argon2id; existing bcrypt hashes still verify and are upgraded on login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
+
+# Each argon2 hash holds ARGON2_MEMORY_COST_KIB while it runs; cap how many the threadpool runs at once
+_password_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_CONCURRENCY)
+
+# User id -> UserResponse snapshot; lets new/expired tokens for a known user skip the DB
+USER_BY_ID_CACHE_TTL_SECONDS = 60
+_user_by_id_cache = TTLCache(maxsize=10000, ttl=USER_BY_ID_CACHE_TTL_SECONDS)
+_user_by_id_cache_lock = threading.RLock()
 
 
 class AuthService:
@@ -23,12 +44,20 @@ class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash password"""
-        return pwd_context.hash(password)
+        with _password_hash_slots:
+            return pwd_context.hash(password)
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify password"""
-        return pwd_context.verify(plain_password, hashed_password)
+        with _password_hash_slots:
+            return pwd_context.verify(plain_password, hashed_password)
+    
+    @staticmethod
+    def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify password; also return a new hash if the stored one uses outdated settings"""
+        with _password_hash_slots:
+            return pwd_context.verify_and_update(plain_password, hashed_password)
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -52,8 +81,8 @@ class AuthService:
             email: str = payload.get("email")
             if user_id is None or email is None:
                 return None
-            return TokenData(sub=user_id, email=email)
-        except JWTError:
+            return TokenData(sub=user_id, email=email, exp=payload.get("exp"))
+        except (PyJWTError, ValidationError):
             return None
     
     @staticmethod
@@ -61,21 +90,55 @@ class AuthService:
         """Get user by email"""
         return db.query(User).filter(User.email == email).first()
     
+    @staticmethod
+    def get_user_by_email_or_username(db: Session, email: str, username: str) -> Optional[User]:
+        """Get a user matching either email or username (single query)"""
+        return db.query(User).filter(
+            or_(User.email == email, User.username == username)
+        ).first()
+    
     @staticmethod
     def get_user_by_id(db: Session, user_id: UUID) -> Optional[User]:
         """Get user by ID"""
         return db.query(User).filter(User.id == user_id).first()
     
     @staticmethod
-    def create_user(db: Session, email: str, username: str, hashed_password: str, selected_certification_id: Optional[UUID] = None) -> User:
-        """Create new user"""
-        user = User(
-            email=email,
-            username=username,
-            hashed_password=hashed_password
+    def get_user_response_by_id(db: Session, user_id: UUID) -> Optional[UserResponse]:
+        """Get a detached user snapshot by ID, served from a short-lived cache"""
+        with _user_by_id_cache_lock:
+            cached = _user_by_id_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        user = AuthService.get_user_by_id(db, user_id)
+        if not user:
+            return None
+        
+        user_response = UserResponse.model_validate(user)
+        with _user_by_id_cache_lock:
+            _user_by_id_cache[user_id] = user_response
+        return user_response
+    
+    @staticmethod
+    def invalidate_cached_user(user_id: UUID) -> None:
+        """Drop a user's cached snapshot after the row changes"""
+        with _user_by_id_cache_lock:
+            _user_by_id_cache.pop(user_id, None)
+    
+    @staticmethod
+    def create_user(db: Session, email: str, username: str, hashed_password: str, selected_certification_id: Optional[UUID] = None) -> Optional[User]:
+        """Create new user; returns None if the email or username is already taken"""
+        # Single round-trip; the unique constraints settle concurrent registrations
+        stmt = (
+            pg_insert(User)
+            .values(email=email, username=username, hashed_password=hashed_password)
+            .on_conflict_do_nothing()
+            .returning(User)
         )
-        db.add(user)
-        db.flush()
+        user = db.scalars(stmt).first()
+        if user is None:
+            db.rollback()
+            return None
         
         # Create profile
         from app.database.models import Profile
@@ -85,6 +148,8 @@ class AuthService:
         )
         db.add(profile)
         
+        # RETURNING already loaded every user column; detach so commit doesn't expire it into a refresh SELECT
+        db.expunge(user)
         db.commit()
-        db.refresh(user)
+        AuthService.invalidate_cached_user(user.id)
         return user
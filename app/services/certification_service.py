@@ -1,21 +1,48 @@
 """Business logic for certification management"""
 
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional
 from uuid import UUID
+from sqlalchemy import and_, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException, status
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from app.database.models import Certification, CertificationDocument, User
-from app.schemas.certification import CertificationCreate
-from app.utils.s3 import upload_file
+from app.database.db import SessionLocal
+from app.database.models import Certification, CertificationDocument
+from app.utils.s3 import stage_upload, is_staged_upload, publish_staged_upload, discard_staged_upload
 from app.services.document_processor import document_processor
 from app.services.embedding_service import embedding_service
+from app.services.quiz_pool import invalidate_quiz_pool
 from app.services.vector_store import vector_store
 
 logger = logging.getLogger(__name__)
 
+# Max documents downloaded/extracted concurrently
+DOCUMENT_PROCESSING_WORKERS = 8
+# Documents a processing run may claim; "processing" ones belong to another run until the claim
+# is older than DOCUMENT_CLAIM_TIMEOUT (the run crashed, timed out or was redeployed mid-way)
+CLAIMABLE_STATUSES = ("pending", "failed")
+DOCUMENT_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+def claimable_documents():
+    """Filter matching documents a processing run may claim now"""
+    stale_before = datetime.utcnow() - DOCUMENT_CLAIM_TIMEOUT
+    return or_(
+        CertificationDocument.processing_status.in_(CLAIMABLE_STATUSES),
+        and_(
+            CertificationDocument.processing_status == "processing",
+            or_(
+                CertificationDocument.claimed_at.is_(None),
+                CertificationDocument.claimed_at < stale_before
+            )
+        )
+    )
+
 
 class CertificationService:
     """Service for managing certifications and their documents"""
@@ -29,79 +56,84 @@ class CertificationService:
     
     def get_by_id(self, certification_id: UUID) -> Optional[Certification]:
         """Get certification by ID"""
-        return self.db.query(Certification).filter(
-            Certification.id == certification_id
-        ).first()
+        return self.db.get(Certification, certification_id)
     
     def create(
         self,
         name: str,
         description: Optional[str],
-        user_id: UUID,
         documents: Optional[List[UploadFile]] = None
     ) -> Certification:
         """
-        Create a new certification (admin only)
+        Create a new certification (callers must enforce admin access)
         
         Args:
             name: Certification name
             description: Optional description
-            user_id: User creating the certification (must be admin)
             documents: Optional list of PDF documents to upload
             
         Returns:
             Created certification
             
         Raises:
-            HTTPException: If user is not admin or certification exists
+            HTTPException: If certification exists
         """
-        # Check admin status
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user or not user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only administrators can create certifications"
-            )
-        
-        # Check for duplicates
-        existing = self.db.query(Certification).filter(
-            Certification.name == name
-        ).first()
+        # Create certification; the unique name constraint rejects duplicates in the same round-trip
+        stmt = (
+            pg_insert(Certification)
+            .values(name=name, description=description)
+            .on_conflict_do_nothing(index_elements=[Certification.name])
+            .returning(Certification)
+        )
+        certification = self.db.scalars(stmt).first()
         
-        if existing:
+        if certification is None:
+            self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Certification already exists"
             )
         
-        # Create certification
-        certification = Certification(name=name, description=description)
-        self.db.add(certification)
-        self.db.flush()
-        
-        # Handle document uploads
+        # Handle document uploads: validate all first so a bad file doesn't leave staged copies behind,
+        # then register every document in the same transaction as the certification
         if documents:
             for file in documents:
-                # Persist each document immediately so background tasks can find it
-                self.add_document(certification.id, file)
+                self._validate_document(file)
+            for file in documents:
+                self._register_document(certification.id, file)
         
         self.db.commit()
         self.db.refresh(certification)
         
-        logger.info(f"Created certification: {certification.name} (ID: {certification.id})")
+        logger.info("Created certification: %s (ID: %s)", certification.name, certification.id)
         return certification
     
     def add_document(self, certification_id: UUID, file: UploadFile) -> CertificationDocument:
-        """Upload and register a document for a certification. Commits the record."""
+        """
+        Stage and register a document for a certification. Commits the record.
+        
+        The file is only copied to local staging here; it is uploaded to S3 by
+        the background processing task, so request latency doesn't depend on file size.
+        """
+        self._validate_document(file)
+        doc = self._register_document(certification_id, file)
+        self.db.commit()
+        self.db.refresh(doc)
+        return doc
+    
+    def _validate_document(self, file: UploadFile) -> None:
+        """Reject anything that isn't a PDF"""
         if not file.filename or not file.filename.endswith('.pdf'):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Only PDF files are allowed"
             )
-        
-        # Upload to S3
+    
+    def _register_document(self, certification_id: UUID, file: UploadFile) -> CertificationDocument:
+        """Stage a validated document and add its record to the session (no commit)"""
+        # Stage locally; publishing to S3 happens in process_documents_sync
         s3_key = f"certifications/{certification_id}/{file.filename}"
-        uri = upload_file(file.file, s3_key)
+        uri = stage_upload(file.file, file.filename)
         
         # Create document record
         doc = CertificationDocument(
@@ -112,10 +144,8 @@ class CertificationService:
             processing_status="pending"
         )
         self.db.add(doc)
-        self.db.commit()
-        self.db.refresh(doc)
         
-        logger.info(f"Uploaded document: {file.filename} for certification {certification_id}")
+        logger.info("Staged document: %s for certification %s", file.filename, certification_id)
         return doc
     
     def process_document_sync(self, document_id: str, certification_id: str):
@@ -126,50 +156,117 @@ class CertificationService:
             document_id: Document ID to process
             certification_id: Parent certification ID
         """
-        doc = self.db.query(CertificationDocument).filter(
-            CertificationDocument.id == document_id
-        ).first()
+        self.process_documents_sync([document_id], certification_id)
+    
+    def process_documents_sync(self, document_ids: List[str], certification_id: str):
+        """
+        Synchronously process several documents of one certification together
         
-        if not doc:
-            logger.error(f"Document {document_id} not found")
+        Documents are downloaded and extracted on a worker pool; each one is
+        embedded and stored as soon as its extraction finishes, so network-bound
+        embedding overlaps with extraction of the remaining documents.
+        
+        Args:
+            document_ids: Document IDs to process
+            certification_id: Parent certification ID
+        """
+        # Claim the documents atomically, so a background task and an inline run
+        # (e.g. from quiz generation) never process the same document at once
+        docs = self.db.scalars(
+            update(CertificationDocument)
+            .where(CertificationDocument.id.in_(document_ids), claimable_documents())
+            .values(processing_status="processing", claimed_at=datetime.utcnow())
+            .returning(CertificationDocument)
+        ).all()
+        
+        if not docs:
+            self.db.commit()
+            logger.info("Documents %s are already processed or being processed", document_ids)
             return
         
-        try:
-            # Update status
-            doc.processing_status = "processing"
+        # Capture what processing needs before commit expires the instances
+        pending = [(doc, str(doc.id), doc.uri, doc.s3_key, doc.filename) for doc in docs]
+        self.db.commit()
+        
+        processed = 0
+        with ThreadPoolExecutor(max_workers=min(DOCUMENT_PROCESSING_WORKERS, len(pending))) as executor:
+            # Step 1: Publish staged uploads before extracting, so a document that fails
+            # extraction still ends up in S3 instead of stranded on this instance's disk
+            published = list(executor.map(self._publish_staged, [(uri, s3_key) for _, _, uri, s3_key, _ in pending]))
+            extractable = []
+            for (doc, document_id, staged_uri, _, filename), uri in zip(pending, published):
+                if uri is None:
+                    doc.processing_status = "failed"
+                else:
+                    doc.uri = uri
+                    extractable.append((doc, document_id, staged_uri, uri, filename))
             self.db.commit()
             
-            logger.info(f"Processing document {doc.filename} (ID: {doc.id})")
+            # Step 2: Extract and chunk documents in parallel
+            futures = {
+                executor.submit(
+                    self._extract,
+                    staged_uri,
+                    uri,
+                    certification_id,
+                    document_id
+                ): (doc, document_id, filename)
+                for doc, document_id, staged_uri, uri, filename in extractable
+            }
             
-            # Step 1: Extract and chunk
-            chunks = document_processor.process_document(
-                url=doc.uri,
+            # Steps 3-4: embed and store each document as soon as it is extracted,
+            # while the workers keep extracting the others
+            for future in as_completed(futures):
+                doc, document_id, filename = futures[future]
+                try:
+                    chunks = future.result()
+                    logger.info("Extracted %s chunks from %s (ID: %s)", len(chunks), filename, document_id)
+                    
+                    # Skip chunks already stored by an earlier run
+                    new_chunks = vector_store.filter_new_chunks(certification_id, chunks)
+                    if new_chunks:
+                        embeddings = embedding_service.embed_texts([chunk.text for chunk in new_chunks])
+                        vector_store.upsert_chunks(certification_id, new_chunks, embeddings)
+                    
+                    doc.processing_status = "completed"
+                    doc.processed_at = datetime.utcnow()
+                    processed += 1
+                except Exception as e:
+                    logger.error("Failed to process document %s: %s", document_id, e)
+                    doc.processing_status = "failed"
+        
+        logger.info("Successfully processed %s of %s documents for certification %s", processed, len(pending), certification_id)
+        self.db.commit()
+        if processed:
+            # Pooled quizzes were generated from the old corpus
+            invalidate_quiz_pool(certification_id)
+    
+    @staticmethod
+    def _publish_staged(uri_and_key) -> Optional[str]:
+        """Publish a locally staged upload to S3; returns the final uri, or None if publishing failed"""
+        uri, s3_key = uri_and_key
+        if not is_staged_upload(uri):
+            return uri
+        try:
+            return publish_staged_upload(uri, s3_key)
+        except Exception as e:
+            logger.error("Failed to publish staged upload %s: %s", uri, e)
+            return None
+    
+    @staticmethod
+    def _extract(staged_uri: str, uri: str, certification_id: str, document_id: str):
+        """Extract chunks from a document, reading the local staged copy while it still exists"""
+        source = staged_uri if is_staged_upload(staged_uri) and os.path.exists(staged_uri) else uri
+        try:
+            return document_processor.process_document(
+                url=source,
                 certification_id=certification_id,
                 document_id=document_id
             )
-            
-            # Step 2: Generate embeddings
-            chunk_texts = [chunk.text for chunk in chunks]
-            embeddings = embedding_service.embed_texts(chunk_texts)
-            
-            # Step 3: Store in vector DB
-            chunk_data = [
-                {"text": chunk.text, "metadata": chunk.metadata}
-                for chunk in chunks
-            ]
-            vector_store.upsert_chunks(certification_id, chunk_data, embeddings)
-            
-            # Mark as completed
-            doc.processing_status = "completed"
-            doc.processed_at = datetime.utcnow()
-            self.db.commit()
-            
-            logger.info(f"Successfully processed {doc.filename}")
-            
-        except Exception as e:
-            logger.error(f"Failed to process document {document_id}: {e}")
-            doc.processing_status = "failed"
-            self.db.commit()
+        finally:
+            # Published (uri changed) copies are no longer needed, whether or not extraction worked
+            if uri != staged_uri:
+                discard_staged_upload(staged_uri)
     
     def get_documents(self, certification_id: UUID) -> List[CertificationDocument]:
         """Get all documents for a certification"""
@@ -177,19 +274,9 @@ class CertificationService:
             CertificationDocument.certification_id == certification_id
         ).all()
     
-    def delete_document(self, document_id: UUID, user_id: UUID):
-        """Delete a document (admin only)"""
-        # Check admin
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user or not user.is_admin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only administrators can delete documents"
-            )
-        
-        doc = self.db.query(CertificationDocument).filter(
-            CertificationDocument.id == document_id
-        ).first()
+    def delete_document(self, document_id: UUID):
+        """Delete a document (callers must enforce admin access)"""
+        doc = self.db.get(CertificationDocument, document_id)
         
         if not doc:
             raise HTTPException(
@@ -202,10 +289,24 @@ class CertificationService:
             try:
                 vector_store.delete_document(str(doc.certification_id), str(document_id))
             except Exception as e:
-                logger.warning(f"Failed to delete from vector store: {e}")
+                logger.warning("Failed to delete from vector store: %s", e)
         
         # Delete from DB
+        certification_id = doc.certification_id
         self.db.delete(doc)
         self.db.commit()
+        # Pooled quizzes may quote the deleted document
+        invalidate_quiz_pool(certification_id)
         
-        logger.info(f"Deleted document {doc.filename}")
+        logger.info("Deleted document %s", doc.filename)
+
+
+def process_documents_task(document_ids: List[str], certification_id: str) -> None:
+    """
+    Background entry point for document processing.
+    
+    Opens its own session instead of reusing the request-scoped one, which
+    FastAPI closes before background tasks run.
+    """
+    with SessionLocal() as db:
+        CertificationService(db).process_documents_sync(document_ids, certification_id)
@@ -1,15 +1,39 @@
 """Document processing: PDF extraction and text chunking"""
 
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
 from io import BytesIO
 import requests
-import pdfplumber
+import pypdfium2 as pdfium
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from app.config import settings
+from app.utils.s3 import get_s3_client
 
 logger = logging.getLogger(__name__)
 
+# PDFium is not thread-safe, so PDFs are read in worker processes, each with its own PDFium,
+# rather than serialized behind a lock: documents handled on the processing threads are
+# extracted in parallel. Spawned (not forked) because the parent runs threads and an event loop.
+PDF_EXTRACTION_PROCESSES = min(4, os.cpu_count() or 1)
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+# Lambda has no /dev/shm, so the pool's multiprocessing semaphores cannot be created there.
+# Without a pool, PDFs are read in-process and calls into PDFium are serialized by _pdfium_lock.
+_pdf_pool_unavailable = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+_pdfium_lock = threading.Lock()
+
+# A line break plus surrounding whitespace/blank lines: strips every line and drops empty ones in one pass
+_LINE_BREAK_RE = re.compile(r"\s*[\r\n]\s*")
+
+# Read size for streamed HTTP downloads
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 try:
     import boto3
     from botocore.exceptions import ClientError
@@ -17,6 +41,47 @@ except ImportError:
     boto3 = None
 
 
+def get_pdf_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the process-wide PDF extraction pool, or None where worker processes are unavailable"""
+    global _pdf_pool, _pdf_pool_unavailable
+    with _pdf_pool_lock:
+        if _pdf_pool is None and not _pdf_pool_unavailable:
+            try:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACTION_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            except (OSError, NotImplementedError) as e:
+                logger.warning("PDF extraction processes unavailable, reading PDFs in-process: %s", e)
+                _pdf_pool_unavailable = True
+        return _pdf_pool
+
+
+def shutdown_pdf_extraction_pool() -> None:
+    """Stop the PDF extraction processes; the next extraction starts a fresh pool"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def _read_pdf_pages(data: bytes) -> List[str]:
+    """Raw text of every page of a PDF (runs in a PDF extraction process, or under _pdfium_lock)"""
+    raw_pages: List[str] = []
+    pdf = pdfium.PdfDocument(data)
+    try:
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            raw_pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return raw_pages
+
+
 class DocumentChunk:
     """Represents a chunk of text from a document"""
     def __init__(
@@ -38,7 +103,9 @@ class DocumentProcessor:
             chunk_size=settings.CHUNK_SIZE,
             chunk_overlap=settings.CHUNK_OVERLAP,
             length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            # Extracted pages never contain blank lines (see _LINE_BREAK_RE), so "\n\n" would only
+            # cost a full extra scan of every page before falling through to "\n"
+            separators=["\n", " ", ""]
         )
     
     def download_file(self, url: str) -> BytesIO:
@@ -46,21 +113,44 @@ class DocumentProcessor:
         try:
             # Check if it's an S3 URL (both s3:// and https://bucket.s3.amazonaws.com)
             if url and (url.startswith("s3://") or "s3.amazonaws.com" in url or f"{settings.AWS_S3_BUCKET}/" in url):
-                logger.info(f"Detected S3 URL, using authenticated download: {url}")
+                logger.info("Detected S3 URL, using authenticated download: %s", url)
                 return self._download_from_s3(url)
             elif url.startswith("http"):
-                logger.warning(f"Using public HTTP download (not S3): {url}")
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                return BytesIO(response.content)
+                logger.warning("Using public HTTP download (not S3): %s", url)
+                return self._download_from_http(url)
             else:
                 # Local file path
+                self._check_document_size(os.path.getsize(url), url)
                 with open(url, 'rb') as f:
                     return BytesIO(f.read())
         except Exception as e:
-            logger.error(f"Failed to download file from {url}: {e}")
+            logger.error("Failed to download file from %s: %s", url, e)
             raise
     
+    @staticmethod
+    def _check_document_size(size: int, url: str) -> None:
+        """Reject documents above MAX_DOCUMENT_BYTES"""
+        if size > settings.MAX_DOCUMENT_BYTES:
+            raise ValueError(
+                f"Document {url} is {size} bytes, above the {settings.MAX_DOCUMENT_BYTES} byte limit"
+            )
+    
+    def _download_from_http(self, url: str) -> BytesIO:
+        """Stream a public URL into memory, aborting once it exceeds MAX_DOCUMENT_BYTES"""
+        with requests.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            content_length = response.headers.get("Content-Length")
+            if content_length:
+                self._check_document_size(int(content_length), url)
+            
+            # Write straight into the buffer instead of buffering the body in requests and copying it
+            file_obj = BytesIO()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                file_obj.write(chunk)
+                self._check_document_size(file_obj.tell(), url)
+        file_obj.seek(0)
+        return file_obj
+    
     def _download_from_s3(self, url: str) -> BytesIO:
         """Download file from S3 using AWS credentials"""
         if not boto3:
@@ -71,42 +161,49 @@ class DocumentProcessor:
         # https://bucket.s3.region.amazonaws.com/certifications/file.pdf -> certifications/file.pdf
         key = url.split(f"{settings.AWS_S3_BUCKET}/", 1)[-1]
         
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
-        )
+        # Shared client: building one per download costs config parsing and a fresh connection pool
+        s3_client = get_s3_client()
         
         # Download file into BytesIO object
         try:
-            logger.info(f"Downloading from S3: s3://{settings.AWS_S3_BUCKET}/{key}")
+            logger.info("Downloading from S3: s3://%s/%s", settings.AWS_S3_BUCKET, key)
+            head = s3_client.head_object(Bucket=settings.AWS_S3_BUCKET, Key=key)
+            self._check_document_size(head["ContentLength"], url)
             file_obj = BytesIO()
             s3_client.download_fileobj(settings.AWS_S3_BUCKET, key, file_obj)
             file_obj.seek(0)  # Reset to beginning
             return file_obj
         except ClientError as e:
-            logger.error(f"S3 download failed for s3://{settings.AWS_S3_BUCKET}/{key}: {e}")
+            logger.error("S3 download failed for s3://%s/%s: %s", settings.AWS_S3_BUCKET, key, e)
             raise
     
     def extract_text_from_pdf(self, file_obj: BytesIO) -> List[Dict[str, Any]]:
-        """Extract text from PDF with pdfplumber, preserving page numbers and layout."""
+        """Extract text from PDF with PDFium, preserving page numbers."""
         try:
+            pool = get_pdf_extraction_pool()
+            if pool is None:
+                with _pdfium_lock:
+                    raw_pages = _read_pdf_pages(file_obj.getvalue())
+            else:
+                try:
+                    raw_pages = pool.submit(_read_pdf_pages, file_obj.getvalue()).result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. PDFium crashed on a malformed file); replace the pool for later documents
+                    shutdown_pdf_extraction_pool()
+                    raise
+            
             pages: List[Dict[str, Any]] = []
-            with pdfplumber.open(file_obj) as pdf:
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    text = page.extract_text(layout=True) or ""
-                    cleaned = "\n".join(line.strip() for line in text.splitlines() if line.strip())
-                    if cleaned:
-                        pages.append({
-                            "page_number": page_num,
-                            "text": cleaned
-                        })
-            logger.info(f"Extracted {len(pages)} pages from PDF")
+            for page_num, text in enumerate(raw_pages, start=1):
+                cleaned = _LINE_BREAK_RE.sub("\n", text).strip()
+                if cleaned:
+                    pages.append({
+                        "page_number": page_num,
+                        "text": cleaned
+                    })
+            logger.info("Extracted %s pages from PDF", len(pages))
             return pages
         except Exception as e:
-            logger.error(f"Failed to extract text from PDF: {e}")
+            logger.error("Failed to extract text from PDF: %s", e)
             raise
     
     def chunk_document(
@@ -118,6 +215,9 @@ class DocumentProcessor:
         """Chunk document text with metadata"""
         chunks = []
         chunk_index = 0
+        # Format the ids once per document rather than once per chunk
+        certification_id_str = str(certification_id)
+        document_id_str = str(document_id)
         
         for page_data in pages:
             page_number = page_data["page_number"]
@@ -128,8 +228,8 @@ class DocumentProcessor:
             
             for text_chunk in text_chunks:
                 metadata = {
-                    "certification_id": str(certification_id),
-                    "document_id": str(document_id),
+                    "certification_id": certification_id_str,
+                    "document_id": document_id_str,
                     "page_number": page_number,
                     "chunk_index": chunk_index
                 }
@@ -141,7 +241,7 @@ class DocumentProcessor:
                 ))
                 chunk_index += 1
         
-        logger.info(f"Created {len(chunks)} chunks from document {document_id}")
+        logger.info("Created %s chunks from document %s", len(chunks), document_id)
         return chunks
     
     def process_document(
@@ -152,7 +252,7 @@ class DocumentProcessor:
     ) -> List[DocumentChunk]:
         """Full pipeline: download → extract → chunk"""
         try:
-            logger.info(f"Processing document {document_id} from {url}")
+            logger.info("Processing document %s from %s", document_id, url)
             
             # Download
             file_obj = self.download_file(url)
@@ -165,7 +265,7 @@ class DocumentProcessor:
             
             return chunks
         except Exception as e:
-            logger.error(f"Document processing failed for {document_id}: {e}")
+            logger.error("Document processing failed for %s: %s", document_id, e)
             raise
 
 
@@ -1,44 +1,127 @@
 """Embedding service: Generate vector embeddings using OpenAI"""
 
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 from app.config import settings
 import time
 
 logger = logging.getLogger(__name__)
 
+try:
+    from fastembed import TextEmbedding
+except ImportError:
+    TextEmbedding = None
+
+# OpenAI accepts up to 2048 inputs and 300k tokens per embeddings request; keep some token headroom
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 250_000
+# Embedding requests in flight at once per call, to stay friendly with rate limits
+MAX_CONCURRENT_BATCHES = 8
+# Batches share a few kept-alive HTTP/2 connections instead of one TLS handshake each
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
 
 class EmbeddingService:
-    """Generate embeddings using OpenAI API"""
+    """Generate embeddings using the OpenAI API or a local fastembed (ONNX) model"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=DefaultHttpxClient(http2=True, limits=HTTP_LIMITS),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS),
+        )
+        self.backend = settings.EMBEDDING_BACKEND
         self.model = settings.EMBEDDING_MODEL
         self.max_retries = 3
         self.retry_delay = 2  # seconds
+        self._local_model = None
+    
+    @property
+    def local_model(self):
+        """Local embedding model, loaded on first use"""
+        if self._local_model is None:
+            if TextEmbedding is None:
+                raise ImportError("fastembed is required for EMBEDDING_BACKEND=fastembed")
+            self._local_model = TextEmbedding(model_name=self.model)
+            logger.info("Loaded local embedding model %s", self.model)
+        return self._local_model
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
         return self.embed_texts([text])[0]
     
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts (batched)"""
+        """Generate embeddings for multiple texts (batched, batches sent concurrently)"""
+        if not texts:
+            return []
+        
+        if self.backend == "fastembed":
+            return self._embed_local(texts)
+        
+        batches = self._make_batches(texts)
+        if len(batches) == 1:
+            results = [self._embed_batch_with_retry(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch_with_retry, batches))
+        
+        all_embeddings = [embedding for batch in results for embedding in batch]
+        logger.info("Generated %s embeddings in %s requests", len(all_embeddings), len(batches))
+        return all_embeddings
+    
+    async def embed_texts_async(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts (batched, batches sent concurrently) with the async client"""
         if not texts:
             return []
         
-        # OpenAI allows up to 2048 texts per request, but we'll be conservative
-        batch_size = 100
-        all_embeddings = []
+        if self.backend == "fastembed":
+            # Local inference is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(self._embed_local, texts)
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            embeddings = self._embed_batch_with_retry(batch)
-            all_embeddings.extend(embeddings)
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._embed_batch_with_retry_async(batch)
         
-        logger.info(f"Generated {len(all_embeddings)} embeddings")
+        batches = self._make_batches(texts)
+        results = await asyncio.gather(*[embed_batch(batch) for batch in batches])
+        
+        all_embeddings = [embedding for batch in results for embedding in batch]
+        logger.info("Generated %s embeddings in %s requests", len(all_embeddings), len(batches))
         return all_embeddings
     
+    def _embed_local(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the local model"""
+        embeddings = [embedding.tolist() for embedding in self.local_model.embed(texts, batch_size=64)]
+        logger.info("Generated %s embeddings locally", len(embeddings))
+        return embeddings
+    
+    @staticmethod
+    def _make_batches(texts: List[str]) -> List[List[str]]:
+        """Split texts into the fewest requests that respect OpenAI's input and token limits"""
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            # UTF-8 length is an upper bound on token count (every token is at least one byte)
+            text_tokens = len(text.encode("utf-8"))
+            if batch and (len(batch) >= MAX_BATCH_INPUTS or batch_tokens + text_tokens > MAX_BATCH_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += text_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
     def _embed_batch_with_retry(self, texts: List[str]) -> List[List[float]]:
         """Embed a batch with retry logic"""
         for attempt in range(self.max_retries):
@@ -52,12 +135,32 @@ class EmbeddingService:
                 return embeddings
             
             except Exception as e:
-                logger.warning(f"Embedding attempt {attempt + 1} failed: {e}")
+                logger.warning("Embedding attempt %s failed: %s", attempt + 1, e)
                 
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay * (attempt + 1))
                 else:
-                    logger.error(f"Failed to generate embeddings after {self.max_retries} attempts")
+                    logger.error("Failed to generate embeddings after %s attempts", self.max_retries)
+                    raise
+    
+    async def _embed_batch_with_retry_async(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch with retry logic, without blocking the event loop"""
+        for attempt in range(self.max_retries):
+            try:
+                response = await self.async_client.embeddings.create(
+                    model=self.model,
+                    input=texts
+                )
+                
+                return [item.embedding for item in response.data]
+            
+            except Exception as e:
+                logger.warning("Embedding attempt %s failed: %s", attempt + 1, e)
+                
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay * (attempt + 1))
+                else:
+                    logger.error("Failed to generate embeddings after %s attempts", self.max_retries)
                     raise
 
 
@@ -2,10 +2,11 @@
 
 import logging
 from uuid import UUID
+from sqlalchemy import exists, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from app.database.models import Profile, Certification
+from app.database.models import Profile, Certification, User
 
 logger = logging.getLogger(__name__)
 
@@ -18,26 +19,25 @@ class ProfileService:
     
     def get_profile(self, user_id: UUID) -> dict:
         """Get user profile by user ID with username and created_at"""
-        from app.database.models import User
-        
-        profile = self.db.query(Profile).filter(
+        # Profile and username in one round trip
+        row = self.db.query(Profile, User.username).join(
+            User, User.id == Profile.user_id
+        ).filter(
             Profile.user_id == user_id
         ).first()
         
-        if not profile:
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Profile not found"
             )
-        
-        # Get user for username and created_at
-        user = self.db.query(User).filter(User.id == user_id).first()
+        profile, username = row
         
         # Convert to dict and add user fields
         profile_dict = {
             "id": profile.id,
             "user_id": profile.user_id,
-            "username": user.username if user else "",
+            "username": username,
             "selected_certification_id": profile.selected_certification_id,
             "xp": profile.xp,
             "level": profile.level,
@@ -63,37 +63,53 @@ class ProfileService:
         Returns:
             Updated profile
         """
-        profile = self.db.query(Profile).filter(
-            Profile.user_id == user_id
-        ).first()
+        if not selected_certification_id:
+            profile = self.db.query(Profile).filter(
+                Profile.user_id == user_id
+            ).first()
+            if not profile:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Profile not found"
+                )
+            return profile
         
-        if not profile:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Profile not found"
+        # Validate the certification and apply the update in a single round-trip
+        stmt = (
+            update(Profile)
+            .where(
+                Profile.user_id == user_id,
+                exists().where(Certification.id == selected_certification_id)
             )
+            .values(selected_certification_id=selected_certification_id)
+            .returning(Profile)
+        )
         
-        # Validate certification if provided
-        if selected_certification_id:
-            cert = self.db.query(Certification).filter(
-                Certification.id == selected_certification_id
-            ).first()
-            
-            if not cert:
+        try:
+            profile = self.db.scalars(stmt).first()
+            if profile is None:
+                # Failure path only: work out whether the profile or the certification is missing
+                profile_exists = self.db.query(
+                    exists().where(Profile.user_id == user_id)
+                ).scalar()
+                if not profile_exists:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Profile not found"
+                    )
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid certification ID"
                 )
             
-            profile.selected_certification_id = selected_certification_id
-        
-        try:
-            self.db.add(profile)
+            # RETURNING already populated the row; detach it so commit doesn't expire it into a refresh SELECT
+            self.db.expunge(profile)
             self.db.commit()
-            self.db.refresh(profile)
             return profile
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error updating profile: {e}")
+            logger.error("Error updating profile: %s", e)
             self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,15 +1,45 @@
 """Business logic for progress tracking and dashboard"""
 
 import logging
-from typing import List
+import threading
+from typing import Any, List, Optional
 from uuid import UUID
-from sqlalchemy.orm import Session
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.orm import Session, raiseload
 from fastapi import HTTPException, status
 
 from app.database.models import UserProgress, Profile, Achievement
 
 logger = logging.getLogger(__name__)
 
+# Serialized dashboard/progress/achievement responses, per user; dropped when a quiz is evaluated
+PROGRESS_CACHE_TTL_SECONDS = 30
+_progress_cache = TTLCache(maxsize=10000, ttl=PROGRESS_CACHE_TTL_SECONDS)
+_progress_cache_lock = threading.Lock()
+
+
+def get_cached_progress(user_id: UUID, key: Any) -> Any:
+    """Return a cached response payload for the user, or None"""
+    with _progress_cache_lock:
+        entry = _progress_cache.get(user_id)
+        return entry.get(key) if entry else None
+
+
+def cache_progress(user_id: UUID, key: Any, payload: Any) -> None:
+    """Cache a response payload for the user"""
+    with _progress_cache_lock:
+        entry = _progress_cache.get(user_id)
+        if entry is None:
+            entry = _progress_cache[user_id] = {}
+        entry[key] = payload
+
+
+def invalidate_progress_cache(user_id: UUID) -> None:
+    """Drop every cached response payload for the user"""
+    with _progress_cache_lock:
+        _progress_cache.pop(user_id, None)
+
 
 class ProgressService:
     """Service for managing user progress and stats"""
@@ -17,30 +47,33 @@ class ProgressService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_dashboard_stats(self, user_id: UUID) -> dict:
+    def get_dashboard_stats(self, user_id: UUID, include_progresses: bool = True) -> dict:
         """
         Get comprehensive dashboard statistics
         
+        Args:
+            user_id: User ID
+            include_progresses: Also return the per-certification progress rows
+        
         Returns:
             Dictionary with profile, progress, and achievement data
         """
-        # Get profile
-        profile = self.db.query(Profile).filter(Profile.user_id == user_id).first()
-        if not profile:
+        # Profile stats and progress rows in one query; the totals are summed from the rows
+        rows = self.db.execute(
+            select(Profile.xp, Profile.level, Profile.current_streak, UserProgress)
+            .outerjoin(UserProgress, UserProgress.user_id == Profile.user_id)
+            .where(Profile.user_id == user_id)
+            .options(raiseload("*"))
+        ).all()
+        if not rows:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User profile not found"
             )
-        
-        # Get all progresses
-        progresses = self.db.query(UserProgress).filter(
-            UserProgress.user_id == user_id
-        ).all()
-        
-        # Calculate aggregates
+        profile = rows[0]
+        progresses = [row.UserProgress for row in rows if row.UserProgress is not None]
         total_questions = sum(p.total_questions_answered or 0 for p in progresses)
         total_correct = sum(p.correct_answers or 0 for p in progresses)
-        average_accuracy = (total_correct / total_questions * 100) if total_questions > 0 else 0
         
         # Get recent achievements
         recent_achievements = (
@@ -57,14 +90,14 @@ class ProgressService:
             "current_streak": profile.current_streak,
             "total_quizzes": sum(p.total_quizzes or 0 for p in progresses),
             "total_questions": total_questions,
-            "average_accuracy": average_accuracy,
+            "average_accuracy": total_correct * 100.0 / total_questions if total_questions > 0 else 0.0,
             "recent_achievements": recent_achievements,
-            "progresses": progresses
+            "progresses": progresses if include_progresses else []
         }
     
     def get_certification_progress(self, user_id: UUID, certification_id: UUID) -> UserProgress:
         """Get progress for a specific certification, creating it if it doesn't exist"""
-        progress = self.db.query(UserProgress).filter(
+        progress = self.db.query(UserProgress).options(raiseload("*")).filter(
             UserProgress.user_id == user_id,
             UserProgress.certification_id == certification_id
         ).first()
@@ -73,9 +106,7 @@ class ProgressService:
         if not progress:
             # Verify certification exists
             from app.database.models import Certification
-            certification = self.db.query(Certification).filter(
-                Certification.id == certification_id
-            ).first()
+            certification = self.db.get(Certification, certification_id)
             
             if not certification:
                 raise HTTPException(
@@ -98,21 +129,30 @@ class ProgressService:
             self.db.add(progress)
             self.db.commit()
             self.db.refresh(progress)
-            logger.info(f"Created initial progress for user {user_id} on certification {certification_id}")
+            invalidate_progress_cache(user_id)
+            logger.info("Created initial progress for user %s on certification %s", user_id, certification_id)
         
         return progress
     
     def get_all_progress(self, user_id: UUID) -> List[UserProgress]:
         """Get progress across all certifications"""
-        return self.db.query(UserProgress).filter(
+        return self.db.query(UserProgress).options(raiseload("*")).filter(
             UserProgress.user_id == user_id
         ).all()
     
-    def get_achievements(self, user_id: UUID) -> List[Achievement]:
-        """Get all user achievements"""
+    def get_achievements(
+        self,
+        user_id: UUID,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Achievement]:
+        """Get user achievements, newest first (all of them unless limit is given)"""
         return (
             self.db.query(Achievement)
+            .options(raiseload("*"))
             .filter(Achievement.user_id == user_id)
             .order_by(Achievement.earned_at.desc())
+            .limit(limit)
+            .offset(offset)
             .all()
         )
@@ -1,16 +1,23 @@
 """Quiz evaluation service - migrated from Supabase functions"""
 
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any
 from uuid import UUID
 from datetime import datetime
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.database.models import (
-    Quiz, Question, UserProgress, Profile, Achievement, User
+    Quiz, Question, UserProgress, Profile, Achievement
 )
+from app.services.progress_service import invalidate_progress_cache
 
 logger = logging.getLogger(__name__)
 
+# One-time milestones: (questions answered, achievement name, description)
+QUESTION_MILESTONES = [
+    (100, "100 Questions", "Answered 100 questions"),
+]
+
 
 class QuizEvaluatorService:
     """Service for evaluating quizzes and scoring"""
@@ -56,10 +63,6 @@ class QuizEvaluatorService:
             user_answer = answers.get(str(question.id))
             is_correct = self._check_answer(question, user_answer)
             
-            # Update question
-            question.user_answer = user_answer
-            question.is_correct = is_correct
-            
             # Calculate XP
             xp_earned = 0
             if is_correct:
@@ -71,7 +74,6 @@ class QuizEvaluatorService:
                 else:  # hard
                     xp_earned = 20
             
-            question.xp_earned = xp_earned
             total_xp += xp_earned
             
             # Track domain performance
@@ -81,16 +83,20 @@ class QuizEvaluatorService:
             if is_correct:
                 domain_performance[question.domain]["correct"] += 1
             
-            question_updates.append(question)
+            question_updates.append({
+                "id": question.id,
+                "user_answer": user_answer,
+                "is_correct": is_correct,
+                "xp_earned": xp_earned
+            })
         
-        # Save question updates
-        for question in question_updates:
-            self.db.add(question)
+        # Save question updates as one batched UPDATE by primary key
+        if question_updates:
+            self.db.execute(update(Question), question_updates)
         
         # Update quiz
         quiz.score = score
         quiz.xp_earned = total_xp
-        self.db.add(quiz)
         
         # Get user profile
         profile = self.db.query(Profile).filter(
@@ -104,14 +110,12 @@ class QuizEvaluatorService:
         new_level = (new_xp // 100) + 1
         
         # Update streak
-        today = datetime.utcnow().strftime("%Y-%m-%d")
+        today = datetime.utcnow().date()
         last_quiz_date = profile.last_quiz_date
         new_streak = profile.current_streak or 0
         
         if last_quiz_date:
-            last_date = datetime.strptime(last_quiz_date, "%Y-%m-%d")
-            current_date = datetime.strptime(today, "%Y-%m-%d")
-            days_diff = (current_date - last_date).days
+            days_diff = (today - last_quiz_date).days
             
             if days_diff == 1:
                 new_streak += 1
@@ -124,7 +128,6 @@ class QuizEvaluatorService:
         profile.level = new_level
         profile.current_streak = new_streak
         profile.last_quiz_date = today
-        self.db.add(profile)
         
         # Calculate accuracy
         accuracy = (score / len(quiz.questions)) * 100 if quiz.questions else 0
@@ -158,6 +161,8 @@ class QuizEvaluatorService:
             UserProgress.certification_id == quiz.certification_id
         ).first()
         
+        previous_questions_answered = (user_progress.total_questions_answered or 0) if user_progress else 0
+        
         if user_progress:
             new_total_quizzes = (user_progress.total_quizzes or 0) + 1
             new_total_questions = (user_progress.total_questions_answered or 0) + len(quiz.questions)
@@ -183,53 +188,59 @@ class QuizEvaluatorService:
                 current_difficulty=next_difficulty,
                 weak_domains=weak_domains
             )
-        
-        self.db.add(user_progress)
+            self.db.add(user_progress)
         
         # Check for achievements
-        achievements = []
+        new_achievements = []
         
         # 7-day streak
         if new_streak == 7:
-            achievement = Achievement(
+            new_achievements.append(Achievement(
                 user_id=user_id,
                 achievement_type="streak",
                 achievement_name="7-Day Streak",
                 achievement_description="Completed quizzes for 7 consecutive days"
-            )
-            self.db.add(achievement)
-            achievements.append("7-Day Streak")
+            ))
         
         # 90%+ accuracy
         if accuracy >= 90:
-            achievement = Achievement(
+            new_achievements.append(Achievement(
                 user_id=user_id,
                 achievement_type="accuracy",
                 achievement_name="Perfect Score",
                 achievement_description="Achieved 90% or higher accuracy on a quiz"
-            )
-            self.db.add(achievement)
-            achievements.append("Perfect Score")
+            ))
         
-        # 100 questions milestone
-        if user_progress.total_questions_answered >= 100:
-            existing = self.db.query(Achievement).filter(
-                Achievement.user_id == user_id,
-                Achievement.achievement_name == "100 Questions"
-            ).first()
-            if not existing:
-                achievement = Achievement(
+        # Question milestones, only on the quiz that crosses them; all already-earned
+        # ones are looked up in a single query however many milestones there are
+        crossed = [
+            (name, description) for threshold, name, description in QUESTION_MILESTONES
+            if previous_questions_answered < threshold <= user_progress.total_questions_answered
+        ]
+        if crossed:
+            earned = {
+                name for (name,) in self.db.query(Achievement.achievement_name).filter(
+                    Achievement.user_id == user_id,
+                    Achievement.achievement_name.in_([name for name, _ in crossed])
+                )
+            }
+            new_achievements.extend(
+                Achievement(
                     user_id=user_id,
                     achievement_type="milestone",
-                    achievement_name="100 Questions",
-                    achievement_description="Answered 100 questions"
+                    achievement_name=name,
+                    achievement_description=description
                 )
-                self.db.add(achievement)
-                achievements.append("100 Questions")
+                for name, description in crossed if name not in earned
+            )
+        
+        self.db.add_all(new_achievements)
+        achievements = [achievement.achievement_name for achievement in new_achievements]
         
         self.db.commit()
+        invalidate_progress_cache(user_id)
         
-        logger.info(f"Quiz {quiz_id} evaluated: score={score}/{len(quiz.questions)}, xp={total_xp}, accuracy={accuracy:.1f}%")
+        logger.info("Quiz %s evaluated: score=%s/%s, xp=%s, accuracy=%.1f%%", quiz_id, score, len(quiz.questions), total_xp, accuracy)
         
         return {
             "success": True,
@@ -250,10 +261,14 @@ class QuizEvaluatorService:
             return False
         
         if question.question_type == "multi_select":
-            # For multi-select, order doesn't matter
-            correct_answers = sorted(question.correct_answer) if isinstance(question.correct_answer, list) else []
-            user_answers = sorted(user_answer) if isinstance(user_answer, list) else []
-            return correct_answers == user_answers
+            # For multi-select, order doesn't matter (the length check rejects repeated picks)
+            correct_answers = question.correct_answer
+            return (
+                isinstance(correct_answers, list)
+                and isinstance(user_answer, list)
+                and len(user_answer) == len(correct_answers)
+                and set(user_answer) == set(correct_answers)
+            )
         else:
             # For single choice and true/false
             return user_answer == question.correct_answer
@@ -1,24 +1,31 @@
+import asyncio
 import logging
-from typing import Optional, List, Dict
+from functools import lru_cache
+from typing import Optional, List, Union
 from uuid import UUID
+import orjson
+from openai import AsyncOpenAI
 from sqlalchemy.orm import Session
 from app.services.quizz_pydantic_models import QuizResponse
+from app.schemas.quiz import QuizGenerateRequest
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
 from langfuse.decorators import observe
 from langfuse.callback import CallbackHandler
-import os
 import time
 from decimal import Decimal
 
 from app.config import settings
+from app.database.db import SessionLocal
+from app.database.enums import Difficulty
 from app.database.models import Quiz, Question, Certification, CertificationDocument
 from app.services.vector_store import vector_store
-from app.services.embedding_service import embedding_service
-from app.services.document_processor import document_processor
+from app.services.certification_service import CertificationService
 from app.services.retrieval_service import retrieval_service
-from datetime import datetime
+from app.services.quiz_pool import (
+    QUIZ_POOL_SIZE, add_to_quiz_pool, get_pooled_quiz, get_quiz_pool_size, quiz_pool_key
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,159 +35,157 @@ AWS_DOMAINS = [
     "Security and Compliance", "Pricing and Support"
 ]
 
+# Pool pre-filling goes through the OpenAI Batch API (half the token price, results within 24h)
+BATCH_POLL_INTERVAL_SECONDS = 60
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+BATCH_MESSAGE_ROLES = {"system": "system", "human": "user"}
 
-class QuizGeneratorService:
-    """Service for generating quizzes directly using LangChain + OpenAI"""
+# Interactive generations run at once per bulk request, to stay within OpenAI rate limits
+MAX_CONCURRENT_GENERATIONS = 8
 
-    def __init__(self, db: Session):
-        self.db = db
-        
-        # Initialize Langfuse callback handler
-        self.langfuse_handler = CallbackHandler()
-        logger.info("Langfuse tracing initialized for quiz generation")
-        
-        # Configure LLM based on model type
-        llm_params = {
-            "api_key": settings.OPENAI_API_KEY,
-            "model": settings.OPENAI_MODEL,
-            "max_completion_tokens": 2000
-        }
-        
-        self.llm = ChatOpenAI(**llm_params)
-        self.parser = PydanticOutputParser(pydantic_object=QuizResponse)
 
-    def _create_prompt(self, certification: str, difficulty: str, domains: List[str], context: str = "") -> PromptTemplate:
-        format_instructions = self.parser.get_format_instructions()
-        # Escape curly braces in format_instructions by doubling them
-        format_instructions_escaped = format_instructions.replace("{", "{{").replace("}", "}}")
-        
-        context_section = ""
-        if context:
-            context_section = (
-                "\n\nUSE THE FOLLOWING OFFICIAL CERTIFICATION CONTENT AS YOUR PRIMARY SOURCE:\n"
-                "===== CERTIFICATION EXAM GUIDE CONTENT =====\n"
-                "{context}\n"
-                "===== END OF CONTENT =====\n\n"
-                "Base your questions DIRECTLY on the content above. "
-                "Questions should test understanding of the specific topics, services, and concepts mentioned.\n"
-            )
-        
-        template = (
-            "You are an expert AWS certification instructor.\n"
-            "Generate exactly 5 quiz questions for {certification} at {difficulty} difficulty level.\n\n"
-            f"{context_section}"
-            "FOCUS PRIMARILY ON THESE AWS DOMAINS:\n"
-            "{domains}\n\n"
-            "Generate a mix of:\n"
-            "- 3 multiple choice questions (single correct answer)\n"
-            "- 1 multi-select question (MUST have 2 or more correct answers, NOT just 1,and don't mention (select two)per example in the question text)\n"
-            "- 1 true/false question\n\n"
-            "For each question:\n"
-            "- Make it realistic and AWS scenario-based\n"
-            "- Ensure options are plausible\n"
-            "- Provide a clear correct answer\n"
-            "- Include a detailed educational explanation\n"
-            "- Assign a correct AWS domain (e.g., EC2, IAM, VPC)\n\n"
-            f"{format_instructions_escaped}"
-        )
-        
-        input_vars = ["certification", "difficulty", "domains"]
-        if context:
-            input_vars.append("context")
-        
-        return PromptTemplate(
-            input_variables=input_vars,
-            template=template
+@lru_cache(maxsize=1)
+def get_langfuse_handler() -> CallbackHandler:
+    """Return the process-wide Langfuse callback handler (created on first use)"""
+    handler = CallbackHandler()
+    logger.info("Langfuse tracing initialized for quiz generation")
+    return handler
+
+
+@lru_cache(maxsize=1)
+def get_quiz_llm() -> ChatOpenAI:
+    """Return the process-wide chat model, so its HTTP connection pool is reused"""
+    # Configure LLM based on model type
+    llm_params = {
+        "api_key": settings.OPENAI_API_KEY,
+        "model": settings.OPENAI_MODEL,
+        "max_completion_tokens": 2000
+    }
+    return ChatOpenAI(**llm_params)
+
+
+@lru_cache(maxsize=1)
+def get_batch_client() -> AsyncOpenAI:
+    """Return the process-wide async OpenAI client used for Batch API jobs"""
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_quiz_parser() -> PydanticOutputParser:
+    """Return the process-wide quiz output parser"""
+    return PydanticOutputParser(pydantic_object=QuizResponse)
+
+
+def _forbid_additional_properties(schema) -> None:
+    """Make a JSON schema strict in place: every object closed, every property required"""
+    if isinstance(schema, dict):
+        if "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+        for value in schema.values():
+            _forbid_additional_properties(value)
+    elif isinstance(schema, list):
+        for item in schema:
+            _forbid_additional_properties(item)
+
+
+@lru_cache(maxsize=1)
+def get_quiz_response_format() -> dict:
+    """Return the structured-output response_format for quiz generations (schema built once)"""
+    schema = QuizResponse.model_json_schema()
+    _forbid_additional_properties(schema)
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "quiz", "strict": True, "schema": schema}
+    }
+
+
+def parse_quiz_response(text: str) -> QuizResponse:
+    """Parse and validate the model's JSON in one pass with pydantic's native JSON parser"""
+    return QuizResponse.model_validate_json(text)
+
+
+@lru_cache(maxsize=2)
+def get_quiz_prompt(with_context: bool) -> ChatPromptTemplate:
+    """Return the quiz prompt template, built once per variant (rendering the format instructions is costly)"""
+    format_instructions = get_quiz_parser().get_format_instructions()
+    # Escape curly braces in format_instructions by doubling them
+    format_instructions_escaped = format_instructions.replace("{", "{{").replace("}", "}}")
+    
+    # The system message contains no variables, so it is a byte-identical prefix on every call
+    # and OpenAI's prompt caching can reuse it; everything request-specific goes in the user message
+    system_template = (
+        "You are an expert AWS certification instructor.\n"
+        "Generate exactly 5 quiz questions for the certification and difficulty level given by the user, "
+        "focusing primarily on the AWS domains they list.\n"
+        "When official certification content is provided, use it as your primary source: base your questions "
+        "DIRECTLY on it and test understanding of the specific topics, services, and concepts it mentions.\n\n"
+        "Generate a mix of:\n"
+        "- 3 multiple choice questions (single correct answer)\n"
+        "- 1 multi-select question (MUST have 2 or more correct answers, NOT just 1,and don't mention (select two)per example in the question text)\n"
+        "- 1 true/false question\n\n"
+        "For each question:\n"
+        "- Make it realistic and AWS scenario-based\n"
+        "- Ensure options are plausible\n"
+        "- Provide a clear correct answer\n"
+        "- Include a detailed educational explanation\n"
+        "- Assign a correct AWS domain (e.g., EC2, IAM, VPC)\n\n"
+        f"{format_instructions_escaped}"
+    )
+    
+    user_template = (
+        "Certification: {certification}\n"
+        "Difficulty: {difficulty}\n"
+        "Focus domains: {domains}"
+    )
+    if with_context:
+        user_template += (
+            "\n\nOFFICIAL CERTIFICATION CONTENT:\n"
+            "===== CERTIFICATION EXAM GUIDE CONTENT =====\n"
+            "{context}\n"
+            "===== END OF CONTENT ====="
         )
+    
+    return ChatPromptTemplate.from_messages([
+        ("system", system_template),
+        ("human", user_template),
+    ])
 
-    @observe(name="generate_quiz")
-    async def generate_quiz(
-        self,
-        user_id: UUID,
-        certification_id: UUID,
-        difficulty: str,
-        weak_domains: Optional[List[str]] = None
-    ) -> Quiz:
-        # Fetch certification
-        certification = self.db.query(Certification).filter(Certification.id == certification_id).first()
-        if not certification:
-            raise ValueError("Certification not found")
-        
-        # Check if documents exist and are processed
-        documents = self.db.query(CertificationDocument).filter(
-            CertificationDocument.certification_id == certification_id
-        ).all()
-        
-        if documents:
-            # Check if any documents need processing
-            unprocessed = [doc for doc in documents if doc.processing_status != "completed"]
-            
-            if unprocessed:
-                logger.info(f"Found {len(unprocessed)} unprocessed documents. Processing before quiz generation...")
-                
-                for doc in unprocessed:
-                    try:
-                        # Update status
-                        doc.processing_status = "processing"
-                        self.db.commit()
-                        
-                        logger.info(f"Processing document {doc.filename}")
-                        
-                        # Process document
-                        chunks = document_processor.process_document(
-                            url=doc.uri,
-                            certification_id=str(certification_id),
-                            document_id=str(doc.id)
-                        )
-                        
-                        # Generate embeddings
-                        chunk_texts = [chunk.text for chunk in chunks]
-                        embeddings = embedding_service.embed_texts(chunk_texts)
-                        
-                        # Store in vector database
-                        chunk_data = [
-                            {"text": chunk.text, "metadata": chunk.metadata}
-                            for chunk in chunks
-                        ]
-                        vector_store.upsert_chunks(str(certification_id), chunk_data, embeddings)
-                        
-                        # Update status
-                        doc.processing_status = "completed"
-                        doc.processed_at = datetime.utcnow()
-                        self.db.commit()
-                        
-                        logger.info(f"Successfully processed document {doc.filename}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to process document {doc.filename}: {e}")
-                        doc.processing_status = "failed"
-                        self.db.commit()
 
-        # Determine focus domains
-        if weak_domains:
-            focus_domains = weak_domains[:3]
-        else:
-            focus_domains = AWS_DOMAINS[:3]
+@lru_cache(maxsize=2)
+def get_quiz_chain(with_context: bool):
+    """Return the process-wide prompt | LLM | parser chain for a prompt variant"""
+    # Structured output: the model can only return schema-valid JSON, so there is no fence or parse-failure path
+    llm = get_quiz_llm().bind(response_format=get_quiz_response_format())
+    return get_quiz_prompt(with_context) | llm | StrOutputParser() | parse_quiz_response
+
 
-        logger.info(f"Generating quiz for user {user_id} | Domains: {focus_domains}")
+class QuizGeneratorService:
+    """Service for generating quizzes directly using LangChain + OpenAI"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.langfuse_handler = get_langfuse_handler()
 
+    def _retrieve_context(self, certification: Certification, focus_domains: List[str]) -> str:
+        """Retrieve certification content for the prompt (empty string when none is available)"""
         # Retrieve relevant context from vector store with randomization
         context = ""
         try:
-            if vector_store.collection_exists(certification_id):
+            if vector_store.collection_exists(certification.id):
                 # Create search query from domains
                 query_text = f"AWS {certification.name} exam questions about {', '.join(focus_domains)}"
                 
                 # Use randomized retrieval for diversity across quizzes
                 chunks = retrieval_service.retrieve_with_randomization(
-                    certification_id=certification_id,
+                    certification_id=certification.id,
                     query=query_text,
                     top_k=10
                 )
                 
                 if chunks:
                     context = "\n\n".join([f"[Source: Page {c['metadata']['page_number']}]\n{c['text']}" for c in chunks])
-                    logger.info(f"Retrieved {len(chunks)} compressed chunks from vector store")
+                    logger.info("Retrieved %s compressed chunks from vector store", len(chunks))
                     
                     # Log document previews for debugging/monitoring
                     logger.info("=== Retrieved Document Previews (Compressed) ===")
@@ -188,34 +193,185 @@ class QuizGeneratorService:
                         preview = chunk['text'][:200].replace('\n', ' ')
                         score = chunk.get('score', 'N/A')
                         page = chunk['metadata'].get('page_number', 'N/A')
-                        logger.info(f"  Chunk {i} [Page {page}, Score: {score}]: {preview}...")
+                        logger.info("  Chunk %s [Page %s, Score: %s]: %s...", i, page, score, preview)
                     logger.info("=== End Previews ===")
                 else:
                     logger.warning("No chunks retrieved from vector store")
             else:
-                logger.warning(f"Vector collection does not exist for certification {certification_id}")
+                logger.warning("Vector collection does not exist for certification %s", certification.id)
         except Exception as e:
-            logger.error(f"Failed to retrieve context from vector store: {e}")
+            logger.error("Failed to retrieve context from vector store: %s", e)
             # Continue without context
+        return context
 
-        # Build prompt and chain
-        prompt = self._create_prompt(certification.name, difficulty, focus_domains, context)
-        chain = prompt | self.llm | self.parser
+    async def _generate_quiz_response(self, certification: Certification, difficulty: str, focus_domains: List[str]) -> QuizResponse:
+        """Retrieve certification context and ask the LLM for a fresh set of questions"""
+        # Embedding the query and searching Qdrant are blocking calls; keep them off the event loop
+        context = await asyncio.to_thread(self._retrieve_context, certification, focus_domains)
+        chain = get_quiz_chain(with_context=bool(context))
 
-        invoke_params = {
+        return await chain.ainvoke(
+            self._prompt_params(certification, difficulty, focus_domains, context),
+            config={"callbacks": [self.langfuse_handler]}
+        )
+
+    @staticmethod
+    def _prompt_params(certification: Certification, difficulty: str, focus_domains: List[str], context: str) -> dict:
+        """Values for the quiz prompt's input variables"""
+        params = {
             "certification": str(certification.name),
             "difficulty": str(difficulty),
             "domains": ", ".join(focus_domains)
         }
         if context:
-            invoke_params["context"] = context
+            params["context"] = context
+        return params
+
+    async def prefill_quiz_pools(
+        self,
+        certification_id: UUID,
+        difficulties: List[str],
+        domain_sets: List[List[str]]
+    ) -> int:
+        """
+        Fill the generation pools for every (difficulty, domains) combination with one Batch API job.
+        
+        Each pool is topped up to QUIZ_POOL_SIZE. Returns the number of generations added.
+        
+        The pools are per-process and the batch is only polled by this coroutine, so the
+        results reach just the worker that submitted the job; if it restarts before the
+        batch completes, the job's output is never collected.
+        """
+        # Fail before any retrieval or upload if a difficulty is unknown
+        difficulties = [Difficulty(difficulty).value for difficulty in difficulties]
+        certification = self.db.get(Certification, certification_id)
+        if not certification:
+            raise ValueError("Certification not found")
+        # The batch job can run for hours; end the read transaction so its connection goes back to the pool
+        self.db.expunge(certification)
+        self.db.rollback()
+
+        requests = []
+        pool_keys = {}
+        for difficulty in difficulties:
+            for domains in domain_sets:
+                focus_domains = domains[:3]
+                pool_key = quiz_pool_key(certification_id, difficulty, focus_domains)
+                for _ in range(QUIZ_POOL_SIZE - get_quiz_pool_size(pool_key)):
+                    # Retrieval is randomized, so every request gets different source material
+                    context = await asyncio.to_thread(self._retrieve_context, certification, focus_domains)
+                    messages = get_quiz_prompt(bool(context)).format_messages(
+                        **self._prompt_params(certification, difficulty, focus_domains, context)
+                    )
+                    custom_id = f"quiz-{len(requests)}"
+                    pool_keys[custom_id] = pool_key
+                    requests.append({
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": {
+                            "model": settings.OPENAI_MODEL,
+                            "messages": [
+                                {"role": BATCH_MESSAGE_ROLES[message.type], "content": message.content}
+                                for message in messages
+                            ],
+                            "max_completion_tokens": 2000,
+                            "response_format": get_quiz_response_format()
+                        }
+                    })
+
+        if not requests:
+            logger.info("Quiz pools for certification %s are already full", certification_id)
+            return 0
+
+        client = get_batch_client()
+        batch_file = await client.files.create(
+            file=("quiz_pool_batch.jsonl", b"\n".join(orjson.dumps(r) for r in requests)),
+            purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Submitted quiz batch %s with %s requests", batch.id, len(requests))
+
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            await asyncio.sleep(BATCH_POLL_INTERVAL_SECONDS)
+            batch = await client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Quiz batch {batch.id} ended with status {batch.status}")
+
+        output = await client.files.content(batch.output_file_id)
+        added = 0
+        for line in output.text.splitlines():
+            result = orjson.loads(line)
+            try:
+                content = result["response"]["body"]["choices"][0]["message"]["content"]
+                add_to_quiz_pool(pool_keys[result["custom_id"]], parse_quiz_response(content))
+                added += 1
+            except Exception as e:
+                logger.warning("Skipping quiz batch result %s: %s", result.get("custom_id"), e)
+
+        logger.info("Quiz batch %s added %s generations to the pools", batch.id, added)
+        return added
+
+    async def process_pending_documents(self, certification_id: UUID) -> None:
+        """Process any of the certification's documents that are not completed yet"""
+        # Check if documents exist and are processed
+        documents = self.db.query(CertificationDocument).filter(
+            CertificationDocument.certification_id == certification_id
+        ).all()
+        
+        if documents:
+            # Check if any documents need processing
+            unprocessed = [doc for doc in documents if doc.processing_status != "completed"]
+            
+            if unprocessed:
+                logger.info("Found %s unprocessed documents. Processing before quiz generation...", len(unprocessed))
+                
+                # Drops the certification's pooled generations once new content is stored
+                await asyncio.to_thread(
+                    CertificationService(self.db).process_documents_sync,
+                    [str(doc.id) for doc in unprocessed],
+                    str(certification_id)
+                )
+
+    @observe(name="generate_quiz")
+    async def generate_quiz(
+        self,
+        user_id: UUID,
+        certification_id: UUID,
+        difficulty: str,
+        weak_domains: Optional[List[str]] = None,
+        process_documents: bool = True
+    ) -> Quiz:
+        # Fetch certification
+        certification = self.db.get(Certification, certification_id)
+        if not certification:
+            raise ValueError("Certification not found")
+        
+        if process_documents:
+            await self.process_pending_documents(certification_id)
+
+        # Determine focus domains
+        if weak_domains:
+            focus_domains = weak_domains[:3]
+        else:
+            focus_domains = AWS_DOMAINS[:3]
+
+        logger.info("Generating quiz for user %s | Domains: %s", user_id, focus_domains)
 
         # Track generation time
         start_time = time.time()
-        quiz_response: QuizResponse = chain.invoke(
-            invoke_params,
-            config={"callbacks": [self.langfuse_handler]}
-        )
+        pool_key = quiz_pool_key(certification_id, difficulty, focus_domains)
+        quiz_response = get_pooled_quiz(pool_key)
+        if quiz_response is None:
+            quiz_response = await self._generate_quiz_response(certification, difficulty, focus_domains)
+            add_to_quiz_pool(pool_key, quiz_response)
+        else:
+            logger.info("Serving pooled generation for %s", pool_key)
         generation_time_seconds = time.time() - start_time
 
         # Save quiz with generation metrics
@@ -246,6 +402,65 @@ class QuizGeneratorService:
 
         self.db.commit()
         self.db.refresh(quiz)
-        logger.info(f"Quiz {quiz.id} generated with {len(quiz_response.questions)} questions")
+        logger.info("Quiz %s generated with %s questions", quiz.id, len(quiz_response.questions))
 
         return quiz
+
+
+async def prefill_quiz_pools_task(
+    certification_id: UUID,
+    difficulties: List[str],
+    domain_sets: List[List[str]]
+) -> None:
+    """
+    Background entry point for quiz pool pre-filling.
+    
+    Opens its own session instead of reusing the request-scoped one, which
+    FastAPI closes before background tasks run.
+    """
+    try:
+        with SessionLocal() as db:
+            await QuizGeneratorService(db).prefill_quiz_pools(certification_id, difficulties, domain_sets)
+    except Exception as e:
+        logger.error("Quiz pool pre-fill failed for certification %s: %s", certification_id, e)
+
+
+async def generate_many(
+    user_id: UUID,
+    requests: List[QuizGenerateRequest],
+    concurrency: int = MAX_CONCURRENT_GENERATIONS
+) -> List[Union[Quiz, Exception]]:
+    """
+    Generate several quizzes concurrently, in request order.
+    
+    A failed generation is returned as its exception instead of discarding the
+    others. Each generation gets its own session: a Session must not be shared
+    by coroutines that interleave at await points.
+    """
+    # Process pending documents once per certification before fanning out
+    with SessionLocal() as db:
+        service = QuizGeneratorService(db)
+        for certification_id in dict.fromkeys(request.certification_id for request in requests):
+            await service.process_pending_documents(certification_id)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate_one(request: QuizGenerateRequest) -> Quiz:
+        async with semaphore:
+            with SessionLocal() as db:
+                quiz = await QuizGeneratorService(db).generate_quiz(
+                    user_id=user_id,
+                    certification_id=request.certification_id,
+                    difficulty=request.difficulty,
+                    weak_domains=request.weak_domains,
+                    process_documents=False
+                )
+                # Load the questions before the session closes
+                db.refresh(quiz, ["questions"])
+                return quiz
+
+    results = await asyncio.gather(*(generate_one(request) for request in requests), return_exceptions=True)
+    for request, result in zip(requests, results):
+        if isinstance(result, Exception):
+            logger.error("Bulk generation failed for certification %s: %s", request.certification_id, result)
+    return results
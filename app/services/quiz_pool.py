@@ -0,0 +1,56 @@
+"""In-process pool of quiz generations, shared by quiz generation and document processing"""
+
+import random
+import threading
+from typing import List, Optional
+from uuid import UUID
+from cachetools import TTLCache
+
+from app.config import settings
+from app.services.quizz_pydantic_models import QuizResponse
+
+# Generations kept per (certification, difficulty, domains, model); once a pool is full,
+# quizzes are sampled from it instead of calling the LLM until the entry expires
+QUIZ_POOL_SIZE = 20
+QUIZ_POOL_TTL_SECONDS = 24 * 60 * 60
+_quiz_pool = TTLCache(maxsize=1024, ttl=QUIZ_POOL_TTL_SECONDS)
+_quiz_pool_lock = threading.Lock()
+
+
+def quiz_pool_key(certification_id: UUID, difficulty: str, focus_domains: List[str]) -> tuple:
+    """Pool key for a generation request; domain order does not matter"""
+    # Ids arrive as UUIDs from requests and as strings from background tasks
+    return (str(certification_id), str(difficulty), tuple(sorted(focus_domains)), settings.OPENAI_MODEL)
+
+
+def get_quiz_pool_size(key: tuple) -> int:
+    """Number of generations currently pooled for key"""
+    with _quiz_pool_lock:
+        return len(_quiz_pool.get(key, ()))
+
+
+def get_pooled_quiz(key: tuple) -> Optional[QuizResponse]:
+    """Return a random pooled generation for key, or None while the pool is still filling"""
+    with _quiz_pool_lock:
+        pool = _quiz_pool.get(key)
+        if pool and len(pool) >= QUIZ_POOL_SIZE:
+            return random.choice(pool)
+    return None
+
+
+def add_to_quiz_pool(key: tuple, quiz_response: QuizResponse) -> None:
+    """Store a fresh generation in the pool for key"""
+    with _quiz_pool_lock:
+        pool = _quiz_pool.get(key)
+        if pool is None:
+            _quiz_pool[key] = [quiz_response]
+        elif len(pool) < QUIZ_POOL_SIZE:
+            pool.append(quiz_response)
+
+
+def invalidate_quiz_pool(certification_id: UUID) -> None:
+    """Drop pooled generations for a certification whose documents changed"""
+    certification_id = str(certification_id)
+    with _quiz_pool_lock:
+        for key in [key for key in _quiz_pool if key[0] == certification_id]:
+            _quiz_pool.pop(key, None)
@@ -3,7 +3,7 @@
 import logging
 from typing import List, Optional
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, raiseload, selectinload
 from fastapi import HTTPException, status
 
 from app.database.models import Quiz
@@ -36,7 +36,8 @@ class QuizService:
         Returns:
             List of quizzes
         """
-        query = self.db.query(Quiz).filter(Quiz.user_id == user_id)
+        # History rows are serialized from columns only; fail loudly on any lazy load
+        query = self.db.query(Quiz).options(raiseload("*")).filter(Quiz.user_id == user_id)
         
         if certification_id:
             query = query.filter(Quiz.certification_id == certification_id)
@@ -57,7 +58,11 @@ class QuizService:
         Raises:
             HTTPException: If quiz not found or user doesn't own it
         """
-        quiz = self.db.query(Quiz).filter(
+        # Questions are loaded up front; any other relationship access raises
+        quiz = self.db.query(Quiz).options(
+            selectinload(Quiz.questions),
+            raiseload("*")
+        ).filter(
             Quiz.id == quiz_id,
             Quiz.user_id == user_id
         ).first()
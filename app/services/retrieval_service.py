@@ -46,7 +46,7 @@ class EnhancedRetrievalService:
             )
             
             if not chunks:
-                logger.warning(f"No chunks found for query: {query}")
+                logger.warning("No chunks found for query: %s", query)
                 return []
             
             # Step 3: Randomly select from pool for diversity
@@ -56,13 +56,13 @@ class EnhancedRetrievalService:
                 selected_chunks = chunks
             
             logger.info(
-                f"Randomized retrieval: {len(chunks)} retrieved → {len(selected_chunks)} randomly selected"
+                "Randomized retrieval: %s retrieved → %s randomly selected", len(chunks), len(selected_chunks)
             )
             
             return selected_chunks
             
         except Exception as e:
-            logger.error(f"Error in randomized retrieval: {e}")
+            logger.error("Error in randomized retrieval: %s", e)
             # Fallback to regular retrieval
             query_embedding = embedding_service.embed_text(query)
             return vector_store.search(
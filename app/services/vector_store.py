@@ -2,35 +2,135 @@
 
 import logging
 from typing import List, Dict, Any, Optional
-from uuid import UUID
-from qdrant_client import QdrantClient
+from uuid import UUID, NAMESPACE_URL, uuid5
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
+    Datatype,
     Distance,
     VectorParams,
     PointStruct,
     Filter,
     FieldCondition,
-    MatchValue
+    MatchValue,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType
 )
 from app.config import settings
+from app.services.document_processor import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+# Searches run on an int8 copy of the vectors kept in RAM and rescore the top hits with the stored float16 vectors
+_QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+
 
 class VectorStore:
     """Manage vector embeddings in Qdrant"""
     
+    # Point IDs per retrieve call when checking which chunks are already stored
+    RETRIEVE_BATCH_SIZE = 1000
+    
     def __init__(self):
-        self.client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
-        )
+        self._client: Optional[QdrantClient] = None
+        self._async_client: Optional[AsyncQdrantClient] = None
         self.embedding_dimension = settings.EMBEDDING_DIMENSIONS
     
+    @property
+    def client(self) -> QdrantClient:
+        """Qdrant client, created on first use so QDRANT_* settings are only read when needed"""
+        if self._client is None:
+            self._client = QdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY
+            )
+        return self._client
+    
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        """Async Qdrant client for use from the event loop, created on first use"""
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY
+            )
+        return self._async_client
+    
+    async def aclose(self) -> None:
+        """Close whichever Qdrant clients have been created"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+    
     def _get_collection_name(self, certification_id: UUID) -> str:
         """Generate collection name for a certification"""
         return f"cert_{str(certification_id).replace('-', '_')}"
     
+    def _get_point_id(self, chunk: DocumentChunk) -> str:
+        """Content-addressed point ID per document, so re-ingesting unchanged chunks is idempotent"""
+        return str(uuid5(NAMESPACE_URL, f"{chunk.metadata['document_id']}:{chunk.text}"))
+    
+    def filter_new_chunks(self, certification_id: UUID, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+        """Drop chunks whose points are already stored, so they aren't embedded again"""
+        collection_name = self._get_collection_name(certification_id)
+        if not chunks or not self.client.collection_exists(collection_name):
+            return chunks
+        
+        ids = [self._get_point_id(chunk) for chunk in chunks]
+        existing = set()
+        for i in range(0, len(ids), self.RETRIEVE_BATCH_SIZE):
+            records = self.client.retrieve(
+                collection_name=collection_name,
+                ids=ids[i:i + self.RETRIEVE_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False
+            )
+            existing.update(str(record.id) for record in records)
+        
+        return self._skip_existing(chunks, ids, existing, collection_name)
+    
+    async def filter_new_chunks_async(self, certification_id: UUID, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+        """Drop chunks whose points are already stored, using the async client"""
+        collection_name = self._get_collection_name(certification_id)
+        if not chunks or not await self.async_client.collection_exists(collection_name):
+            return chunks
+        
+        ids = [self._get_point_id(chunk) for chunk in chunks]
+        existing = set()
+        for i in range(0, len(ids), self.RETRIEVE_BATCH_SIZE):
+            records = await self.async_client.retrieve(
+                collection_name=collection_name,
+                ids=ids[i:i + self.RETRIEVE_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False
+            )
+            existing.update(str(record.id) for record in records)
+        
+        return self._skip_existing(chunks, ids, existing, collection_name)
+    
+    def _skip_existing(
+        self,
+        chunks: List[DocumentChunk],
+        ids: List[str],
+        existing: set,
+        collection_name: str
+    ) -> List[DocumentChunk]:
+        """Keep chunks whose point ID isn't stored yet (first occurrence only)"""
+        new_chunks = []
+        seen = set(existing)
+        for chunk, point_id in zip(chunks, ids):
+            if point_id not in seen:
+                seen.add(point_id)
+                new_chunks.append(chunk)
+        if len(new_chunks) < len(chunks):
+            logger.info("Skipping %s already-stored chunks in %s", len(chunks) - len(new_chunks), collection_name)
+        return new_chunks
+    
     def create_collection(self, certification_id: UUID) -> None:
         """Create a new collection for a certification"""
         collection_name = self._get_collection_name(certification_id)
@@ -39,27 +139,33 @@ class VectorStore:
             # Check if collection exists
             collections = self.client.get_collections().collections
             if any(c.name == collection_name for c in collections):
-                logger.info(f"Collection {collection_name} already exists")
+                logger.info("Collection %s already exists", collection_name)
                 return
             
             # Create collection
             self.client.create_collection(
                 collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=self.embedding_dimension,
-                    distance=Distance.COSINE
-                )
+                vectors_config=self._vectors_config(),
+                quantization_config=_QUANTIZATION_CONFIG
             )
-            logger.info(f"Created collection: {collection_name}")
+            logger.info("Created collection: %s", collection_name)
         
         except Exception as e:
-            logger.error(f"Failed to create collection {collection_name}: {e}")
+            logger.error("Failed to create collection %s: %s", collection_name, e)
             raise
     
+    def _vectors_config(self) -> VectorParams:
+        """Vector parameters for new collections (float16 halves vector storage versus float32)"""
+        return VectorParams(
+            size=self.embedding_dimension,
+            distance=Distance.COSINE,
+            datatype=Datatype.FLOAT16
+        )
+    
     def upsert_chunks(
         self,
         certification_id: UUID,
-        chunks: List[Dict[str, Any]],
+        chunks: List[DocumentChunk],
         embeddings: List[List[float]]
     ) -> None:
         """Insert or update chunk embeddings"""
@@ -68,21 +174,7 @@ class VectorStore:
         # Ensure collection exists
         self.create_collection(certification_id)
         
-        # Prepare points
-        points = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point = PointStruct(
-                id=idx,  # Use chunk index as ID (or generate UUID)
-                vector=embedding,
-                payload={
-                    "text": chunk["text"],
-                    "certification_id": str(certification_id),
-                    "document_id": chunk["metadata"]["document_id"],
-                    "page_number": chunk["metadata"]["page_number"],
-                    "chunk_index": chunk["metadata"]["chunk_index"]
-                }
-            )
-            points.append(point)
+        points = self._build_points(certification_id, chunks, embeddings)
         
         # Upsert in batches
         batch_size = 100
@@ -93,7 +185,74 @@ class VectorStore:
                 points=batch
             )
         
-        logger.info(f"Upserted {len(points)} points to {collection_name}")
+        logger.info("Upserted %s points to %s", len(points), collection_name)
+    
+    async def create_collection_async(self, certification_id: UUID) -> None:
+        """Create a new collection for a certification using the async client"""
+        collection_name = self._get_collection_name(certification_id)
+        
+        try:
+            if await self.async_client.collection_exists(collection_name):
+                logger.info("Collection %s already exists", collection_name)
+                return
+            
+            await self.async_client.create_collection(
+                collection_name=collection_name,
+                vectors_config=self._vectors_config(),
+                quantization_config=_QUANTIZATION_CONFIG
+            )
+            logger.info("Created collection: %s", collection_name)
+        
+        except Exception as e:
+            logger.error("Failed to create collection %s: %s", collection_name, e)
+            raise
+    
+    async def upsert_chunks_async(
+        self,
+        certification_id: UUID,
+        chunks: List[DocumentChunk],
+        embeddings: List[List[float]]
+    ) -> None:
+        """Insert or update chunk embeddings using the async client"""
+        collection_name = self._get_collection_name(certification_id)
+        
+        # Ensure collection exists
+        await self.create_collection_async(certification_id)
+        
+        points = self._build_points(certification_id, chunks, embeddings)
+        
+        # Upsert in batches
+        batch_size = 100
+        for i in range(0, len(points), batch_size):
+            await self.async_client.upsert(
+                collection_name=collection_name,
+                points=points[i:i + batch_size]
+            )
+        
+        logger.info("Upserted %s points to %s", len(points), collection_name)
+    
+    def _build_points(
+        self,
+        certification_id: UUID,
+        chunks: List[DocumentChunk],
+        embeddings: List[List[float]]
+    ) -> List[PointStruct]:
+        """Build Qdrant points from chunks and their embeddings"""
+        certification_id_str = str(certification_id)
+        return [
+            PointStruct(
+                id=self._get_point_id(chunk),
+                vector=embedding,
+                payload={
+                    "text": chunk.text,
+                    "certification_id": certification_id_str,
+                    "document_id": chunk.metadata["document_id"],
+                    "page_number": chunk.metadata["page_number"],
+                    "chunk_index": chunk.metadata["chunk_index"]
+                }
+            )
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
     
     def search(
         self,
@@ -137,11 +296,11 @@ class VectorStore:
                     }
                 })
             
-            logger.info(f"Found {len(chunks)} similar chunks")
+            logger.info("Found %s similar chunks", len(chunks))
             return chunks
         
         except Exception as e:
-            logger.error(f"Search failed in {collection_name}: {e}")
+            logger.error("Search failed in %s: %s", collection_name, e)
             raise
     
     def delete_collection(self, certification_id: UUID) -> None:
@@ -150,9 +309,9 @@ class VectorStore:
         
         try:
             self.client.delete_collection(collection_name)
-            logger.info(f"Deleted collection: {collection_name}")
+            logger.info("Deleted collection: %s", collection_name)
         except Exception as e:
-            logger.warning(f"Failed to delete collection {collection_name}: {e}")
+            logger.warning("Failed to delete collection %s: %s", collection_name, e)
     
     def collection_exists(self, certification_id: UUID) -> bool:
         """Check if collection exists"""
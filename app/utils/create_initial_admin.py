@@ -21,7 +21,7 @@ def create_initial_admin(db: Session) -> None:
         admin_exists = db.query(User).filter(User.is_admin == True).first()
         
         if admin_exists:
-            logger.info(f"Admin user already exists: {admin_exists.email}")
+            logger.info("Admin user already exists: %s", admin_exists.email)
             return
         
         # Create initial admin
@@ -38,9 +38,9 @@ def create_initial_admin(db: Session) -> None:
         db.commit()
         db.refresh(admin)
         
-        logger.info(f"✅ Initial admin created: {admin.email} (username: {admin.username})")
+        logger.info("✅ Initial admin created: %s (username: %s)", admin.email, admin.username)
         logger.info("⚠️  Change the default password immediately!")
         
     except Exception as e:
-        logger.error(f"Failed to create initial admin: {e}")
+        logger.error("Failed to create initial admin: %s", e)
         db.rollback()
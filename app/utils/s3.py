@@ -1,5 +1,8 @@
 import os
+import shutil
+import tempfile
 import logging
+from functools import lru_cache
 from typing import Tuple, Optional
 from app.config import settings
 
@@ -7,10 +10,77 @@ logger = logging.getLogger(__name__)
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.exceptions import BotoCoreError, ClientError
 except Exception:
     boto3 = None
 
+# Stream uploads to S3 in 8 MB multipart chunks instead of buffering whole files
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Return a process-wide S3 client (boto3 client construction is slow)"""
+    return boto3.client(
+        "s3",
+        aws_access_key_id=getattr(settings, "AWS_ACCESS_KEY_ID", None),
+        aws_secret_access_key=getattr(settings, "AWS_SECRET_ACCESS_KEY", None),
+        region_name=getattr(settings, "AWS_REGION", None),
+    )
+
+
+# Where request handlers stage uploads until a background task publishes them
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "aws-mind-quest-uploads")
+
+
+def stage_upload(file_obj, filename: str) -> str:
+    """Copy an incoming upload to a local staging file and return its path.
+
+    Keeps the request path to a local disk copy; the S3 upload happens later
+    via `publish_staged_upload` from a background task.
+    """
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=STAGING_DIR, suffix=f"-{os.path.basename(filename)}")
+    file_obj.seek(0)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(file_obj, f, UPLOAD_CHUNK_SIZE)
+    return path
+
+
+def is_staged_upload(uri: Optional[str]) -> bool:
+    """Whether `uri` points at a locally staged, not yet published upload"""
+    return bool(uri) and os.path.dirname(uri) == STAGING_DIR
+
+
+def publish_staged_upload(path: str, filename: str) -> str:
+    """Upload a staged file via `upload_file` and return the final URL.
+
+    The local copy is kept so the caller can still read it; remove it with
+    `discard_staged_upload`. Safe to call again after the copy is gone, as
+    long as an earlier call reached S3.
+    """
+    if not os.path.exists(path):
+        bucket = getattr(settings, "AWS_S3_BUCKET", None)
+        key = f"certifications/{filename}"
+        if bucket and s3_object_exists(bucket, key):
+            region = getattr(settings, "AWS_REGION", None) or "us-east-1"
+            return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+        raise FileNotFoundError(f"Staged upload {path} is gone and was never published")
+    with open(path, "rb") as f:
+        _, url = upload_file(f, filename)
+    if not url:
+        raise RuntimeError(f"Failed to publish staged upload {path}")
+    return url
+
+
+def discard_staged_upload(path: str) -> None:
+    """Remove a staged upload's local copy (no-op if it is already gone)"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
 
 def ensure_uploads_dir(path: str = "uploads"):
     os.makedirs(path, exist_ok=True)
@@ -25,12 +95,7 @@ def upload_file(file_obj, filename: str) -> Tuple[Optional[str], Optional[str]]:
     # Prefer S3 if bucket configured and boto3 available
     bucket = getattr(settings, "AWS_S3_BUCKET", None)
     if bucket and boto3:
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=getattr(settings, "AWS_ACCESS_KEY_ID", None),
-            aws_secret_access_key=getattr(settings, "AWS_SECRET_ACCESS_KEY", None),
-            region_name=getattr(settings, "AWS_REGION", None),
-        )
+        s3 = get_s3_client()
         key = f"certifications/{filename}"
         try:
             # If object already exists in S3, return its URL and avoid re-upload
@@ -38,36 +103,46 @@ def upload_file(file_obj, filename: str) -> Tuple[Optional[str], Optional[str]]:
                 s3.head_object(Bucket=bucket, Key=key)
                 region = getattr(settings, "AWS_REGION", None) or "us-east-1"
                 url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
-                logger.info(f"S3 object already exists: s3://{bucket}/{key}")
+                logger.info("S3 object already exists: s3://%s/%s", bucket, key)
                 return key, url
             except ClientError:
                 # Not found, proceed to upload
                 pass
             # file_obj is a SpooledTemporaryFile or file-like with read()
             file_obj.seek(0)
-            s3.upload_fileobj(file_obj, bucket, key)
+            s3.upload_fileobj(
+                file_obj,
+                bucket,
+                key,
+                Config=TransferConfig(
+                    multipart_threshold=UPLOAD_CHUNK_SIZE,
+                    multipart_chunksize=UPLOAD_CHUNK_SIZE,
+                    use_threads=True,
+                ),
+            )
             region = getattr(settings, "AWS_REGION", None)
             if region:
                 url = f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
             else:
                 url = f"https://{bucket}.s3.amazonaws.com/{key}"
-            logger.info(f"Uploaded file to S3: s3://{bucket}/{key}")
+            logger.info("Uploaded file to S3: s3://%s/%s", bucket, key)
             return key, url
         except (BotoCoreError, ClientError) as e:
-            logger.exception(f"S3 upload failed for s3://{bucket}/{key}: {e}")
+            logger.exception("S3 upload failed for s3://%s/%s: %s", bucket, key, e)
             return None, None
     # Fallback to local storage
     uploads_dir = ensure_uploads_dir()
     path = os.path.join(uploads_dir, filename)
     try:
         file_obj.seek(0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "wb") as f:
-            f.write(file_obj.read())
+            shutil.copyfileobj(file_obj, f, UPLOAD_CHUNK_SIZE)
         url = path
-        logger.info(f"Saved file locally: {path}")
+        logger.info("Saved file locally: %s", path)
         return None, url
     except Exception as e:
-        logger.exception(f"Local file save failed: {e}")
+        logger.exception("Local file save failed: %s", e)
         return None, None
 
 
@@ -115,12 +190,7 @@ def parse_s3_path(s3_path: str) -> tuple[str, str, str]:
 def s3_object_exists(bucket: str, key: str) -> bool:
     if not boto3:
         return False
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=getattr(settings, "AWS_ACCESS_KEY_ID", None),
-        aws_secret_access_key=getattr(settings, "AWS_SECRET_ACCESS_KEY", None),
-        region_name=getattr(settings, "AWS_REGION", None),
-    )
+    s3 = get_s3_client()
     try:
         s3.head_object(Bucket=bucket, Key=key)
         return True
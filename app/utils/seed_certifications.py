@@ -61,10 +61,24 @@ def seed_certifications(db: Session):
     """Insert predefined certifications if they don't already exist. Returns list of document IDs to process."""
     documents_to_process = []
     
+    # Load already-seeded certifications and their documents up front (two queries total)
+    existing_certs = {
+        c.name: c
+        for c in db.query(Certification).filter(
+            Certification.name.in_([cert["name"] for cert in PREDEFINED_CERTIFICATIONS])
+        ).all()
+    }
+    existing_docs = {
+        (d.certification_id, d.s3_key): d
+        for d in db.query(CertificationDocument).filter(
+            CertificationDocument.certification_id.in_([c.id for c in existing_certs.values()])
+        ).all()
+    } if existing_certs else {}
+    
     for cert in PREDEFINED_CERTIFICATIONS:
-        existing = db.query(Certification).filter(Certification.name == cert["name"]).first()
+        existing = existing_certs.get(cert["name"])
         if existing:
-            logger.info(f"Certification already exists: {cert['name']}")
+            logger.info("Certification already exists: %s", cert['name'])
             # Ensure documents exist in DB for existing certification
             docs = cert.get("documents", [])
             for d in docs:
@@ -75,14 +89,11 @@ def seed_certifications(db: Session):
                 try:
                     bucket, key, url = parse_s3_path(s3_path)
                 except ValueError:
-                    logger.warning(f"Skipping invalid s3 path in seed: {s3_path}")
+                    logger.warning("Skipping invalid s3 path in seed: %s", s3_path)
                     continue
 
                 # avoid duplicates
-                exists_doc = db.query(CertificationDocument).filter(
-                    CertificationDocument.certification_id == existing.id,
-                    CertificationDocument.s3_key == key
-                ).first()
+                exists_doc = existing_docs.get((existing.id, key))
                 if exists_doc:
                     # Check if existing document needs processing
                     if exists_doc.processing_status != "completed":
@@ -101,7 +112,7 @@ def seed_certifications(db: Session):
                     db.flush()  # Get doc.id
                     documents_to_process.append((str(doc.id), str(existing.id)))
                 else:
-                    logger.warning(f"S3 object not found for seed: s3://{bucket}/{key}")
+                    logger.warning("S3 object not found for seed: s3://%s/%s", bucket, key)
             continue
         c = Certification(name=cert["name"], description=cert.get("description", ""))
         db.add(c)
@@ -118,7 +129,7 @@ def seed_certifications(db: Session):
             try:
                 bucket, key, _ = parse_s3_path(s3_uri)
             except ValueError:
-                logger.warning(f"Skipping invalid s3 path in seed: {s3_uri}")
+                logger.warning("Skipping invalid s3 path in seed: %s", s3_uri)
                 continue
 
             if s3_object_exists(bucket, key):
@@ -132,12 +143,12 @@ def seed_certifications(db: Session):
                 db.flush()  # Get doc.id
                 documents_to_process.append((str(doc.id), str(c.id)))
             else:
-                logger.warning(f"S3 object not found for seed: s3://{bucket}/{key}")
+                logger.warning("S3 object not found for seed: s3://%s/%s", bucket, key)
     try:
         db.commit()
-        logger.info(f"Seeded predefined certifications. {len(documents_to_process)} documents to process.")
+        logger.info("Seeded predefined certifications. %s documents to process.", len(documents_to_process))
         return documents_to_process
     except Exception as e:
         db.rollback()
-        logger.error(f"Failed to seed certifications: {e}")
+        logger.error("Failed to seed certifications: %s", e)
         return []
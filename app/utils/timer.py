@@ -31,7 +31,7 @@ def timer(logger: logging.Logger | None = None):
                     return await func(*args, **kwargs)
                 finally:
                     elapsed_ms = (time.perf_counter() - start) * 1000
-                    logger.info(f"{func.__module__}.{func.__name__} executed in {elapsed_ms:.2f} ms")
+                    logger.info("%s.%s executed in %.2f ms", func.__module__, func.__name__, elapsed_ms)
 
             return _async_wrapper
 
@@ -43,7 +43,7 @@ def timer(logger: logging.Logger | None = None):
                     return func(*args, **kwargs)
                 finally:
                     elapsed_ms = (time.perf_counter() - start) * 1000
-                    logger.info(f"{func.__module__}.{func.__name__} executed in {elapsed_ms:.2f} ms")
+                    logger.info("%s.%s executed in %.2f ms", func.__module__, func.__name__, elapsed_ms)
 
             return _sync_wrapper
 